@@ -0,0 +1,805 @@
+#!/usr/bin/env python3
+"""
+祝福语爬虫离线基准测试
+
+不联网：用 blessings.json 合成候选文本语料（也可指定保存下来的候选集），
+测量提取/过滤/去重/保存热路径的单条耗时、吞吐量与内存峰值，并校验新旧实现结果一致。
+任何一致性校验失败都以状态 1 退出，可直接用作快速实现的回归测试。
+可保存基线结果，之后与基线对比以发现启发式规则改动带来的性能退化。
+
+Usage:
+    python scripts/bench_blessings.py                       # 运行全部基准
+    python scripts/bench_blessings.py keywords              # 只运行关键词匹配基准
+    python scripts/bench_blessings.py features              # 候选打分：逐条 vs NumPy 批量(50/1000/全部)
+    python scripts/bench_blessings.py extract               # bs4 与 lxml 流式提取器的速度与一致性
+    python scripts/bench_blessings.py encoding --raw-pages saved_pages/
+                                                            # 页面解码：整页字符集探测 vs 快速解析器
+    python scripts/bench_blessings.py dedup save            # 去重(桶大小 10/100/1k/10k)与 blessings.json 写出
+    python scripts/bench_blessings.py export                # 首次加载：整个 blessings.json vs manifest + 单个分片
+    python scripts/bench_blessings.py index                 # 按分类取祝福语：逐级扫描回退 vs BlessingIndex
+    python scripts/bench_blessings.py --save-baseline bench_baseline.json
+    python scripts/bench_blessings.py --baseline bench_baseline.json   # 比基线慢 10% 以上时报告退化并返回 1
+    python scripts/bench_blessings.py --corpus cands.jsonl  # 使用保存的候选集(每行一条 JSON 字符串)
+    python scripts/bench_blessings.py --archive output/pages.jsonl.gz --save-corpus cands.jsonl
+                                                            # 从归档页面提取真实候选集并保存
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+
+import scrape_blessings as sb
+from blessing_index import BlessingIndex
+
+DEFAULT_BLESSINGS_FILE = sb.SCRIPT_DIR.parent / "blessings.json"
+
+# Bucket sizes for the dedup benchmark and corpus sizes for the save benchmark
+DEDUP_BUCKET_SIZES = [10, 100, 1000, 10000]
+SAVE_CORPUS_SIZES = [1000, 10000, 100000]
+# Synthetic corpus sizes for the export benchmark (besides the shipped file)
+EXPORT_CORPUS_SIZES = [10000, 100000]
+# Candidates per call for the batched feature stage (besides the whole corpus)
+FEATURE_BATCH_SIZES = [50, 1000]
+# Random (rel, style, length) lookups per index benchmark pass
+INDEX_LOOKUPS = 100000
+# Default slowdown (percent over the baseline) reported as a regression
+REGRESSION_TOLERANCE = 10.0
+
+# Typical non-blessing lines seen on scraped pages
+NOISE_LINES = [
+    "首页 > 祝福语 > 春节祝福语",
+    "本站所有内容版权归原作者所有，如有侵权请联系删除",
+    "点击下载APP，扫码关注微信公众号获取更多祝福",
+    "上一页 下一页 返回列表",
+    "相关阅读：春节习俗大全 | 拜年礼仪",
+    "登录 注册 会员中心",
+    "原文链接：https://example.com/article/2026",
+    "评论(12) 分享到：微博 微信 QQ空间",
+    "阅读全文 展开全部 查看更多精彩内容",
+    "2026年2月13日 星期五 农历腊月廿六",
+    "作者：编辑部 责任编辑：小李",
+    "热门推荐 猜你喜欢 精选专题",
+]
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+
+def load_blessing_texts(path: Path = DEFAULT_BLESSINGS_FILE) -> list[str]:
+    """All blessing texts from a blessings.json file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        item["text"]
+        for styles in data["blessings"].values()
+        for lengths in styles.values()
+        for items in lengths.values()
+        for item in items
+    ]
+
+
+def build_candidate_corpus(texts: list[str], size: int = 20000, seed: int = 2026) -> list[str]:
+    """Synthetic extraction candidates: whole blessings, sentence fragments and page noise.
+
+    Roughly mirrors what extract_blessings_from_html yields on a real page,
+    where most candidates are fragments or noise that get rejected.
+    """
+    rng = random.Random(seed)
+    fragments = [part for t in texts for part in t.replace("！", "。").split("。") if part]
+    corpus = []
+    while len(corpus) < size:
+        roll = rng.random()
+        if roll < 0.3:
+            corpus.append(rng.choice(texts))
+        elif roll < 0.6:
+            corpus.append(rng.choice(fragments))
+        else:
+            corpus.append(rng.choice(NOISE_LINES))
+    return corpus
+
+
+def build_synthetic_blessings(texts: list[str], count: int, seed: int = 2026) -> list[str]:
+    """count distinct blessing-like texts, stitched from sentences of real ones.
+
+    blessings.json only holds a few hundred texts; recombining their
+    sentences gives realistic length and vocabulary at any corpus size.
+    """
+    rng = random.Random(seed)
+    sentences = [part + "。" for t in texts for part in t.replace("！", "。").split("。") if part]
+    result: dict[str, None] = {}
+    while len(result) < count:
+        result["".join(rng.sample(sentences, rng.randint(2, 4)))] = None
+    return list(result)
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    """A near-duplicate of text: a couple of characters dropped or swapped."""
+    chars = list(text)
+    for _ in range(2):
+        i = rng.randrange(len(chars))
+        if rng.random() < 0.5:
+            del chars[i]
+        else:
+            chars[i] = rng.choice(chars)
+    return "".join(chars)
+
+
+def archive_pages(path: Path) -> list[str]:
+    """Distinct page bodies stored in a PageArchive file."""
+    return [rec["html"] for rec in sb.PageArchive.iter_records(path) if "html" in rec]
+
+
+def archive_candidates(path: Path) -> list[str]:
+    """Raw extraction candidates from the pages in a PageArchive file."""
+    return [text for html in archive_pages(path) for text in sb.extract_blessings_streaming(html)]
+
+
+def build_html_fixtures(texts: list[str], count: int = 60, seed: int = 2026) -> list[str]:
+    """Frozen HTML pages in the layouts the extractor targets.
+
+    Mixes list pages, numbered paragraphs, content divs, bold items, page
+    chrome (nav/footer/script/comments) and a few large WeChat-style
+    articles with nested markup.
+    """
+    rng = random.Random(seed)
+
+    def chrome(body: str) -> str:
+        return (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'><title>春节祝福语大全</title>"
+            "<style>.x{color:red}</style><script>var s='祝福';</script></head><body>"
+            "<header><a href='/'>首页</a></header><nav><ul><li>导航 祝福语 春节</li></ul></nav>"
+            f"{body}<!-- 推荐位 --><aside><p>热门推荐 新年快乐祝福</p></aside>"
+            "<footer><p>版权所有 © 2026 备案号</p></footer></body></html>"
+        )
+
+    layouts = [
+        lambda items: "<ul>" + "".join(f"<li>{t}</li>" for t in items) + "</ul>",
+        lambda items: "".join(f"<p>{i + 1}、{t}</p>" for i, t in enumerate(items)),
+        lambda items: "<p>" + " ".join(f"{i + 1}．{t}" for i, t in enumerate(items)) + "</p>",
+        lambda items: ("<div class='article-content'>"
+                       + "<br>".join(f"{i + 1}.{t}" for i, t in enumerate(items)) + "</div>"),
+        lambda items: "".join(f"<section><strong>{t}</strong><span>{NOISE_LINES[0]}</span></section>"
+                              for t in items),
+        lambda items: ("<div id='js_content' class='rich_media_content'>"
+                       + "".join(f"<section><p><span style='x'>{t[:20]}</span><b>{t[20:]}</b></p>"
+                                 f"<p><br></p></section>" for t in items) + "</div>"),
+    ]
+    pages = []
+    for i in range(count):
+        layout = layouts[i % len(layouts)]
+        size = 400 if i % 20 == 5 else rng.randint(10, 40)  # a few large articles
+        items = [rng.choice(texts) for _ in range(size)] + rng.sample(NOISE_LINES, 3)
+        pages.append(chrome(layout(items)))
+    return pages
+
+
+def build_encoded_fixtures(pages: list[str]) -> list[tuple[str, str | None, bytes]]:
+    """(host, Content-Type charset, body) triples in UTF-8, GBK and GB18030.
+
+    Each site serves one encoding and declares it in the header, only in a
+    <meta> tag, or not at all, as real blessing sites do.
+    """
+    encodings = ["utf-8", "gbk", "gb18030"]
+    fixtures = []
+    for i, html in enumerate(pages):
+        site = i % 9
+        encoding = encodings[site % 3]
+        declare = site // 3  # 0: header, 1: <meta> only, 2: nothing
+        html = html.replace("<meta charset='utf-8'>",
+                            f"<meta charset='{encoding}'>" if declare == 1 else "")
+        body = html.encode(encoding, errors="xmlcharrefreplace")
+        fixtures.append((f"site{site}.example", encoding if declare == 0 else None, body))
+    return fixtures
+
+
+def load_raw_pages(path: Path) -> list[tuple[str, str | None, bytes]]:
+    """Saved raw page bodies laid out as <dir>/<host>/<name>, charset undeclared."""
+    return [(f.parent.name, None, f.read_bytes())
+            for f in sorted(path.glob("*/*")) if f.is_file()]
+
+
+def load_corpus(args) -> list[str]:
+    """Candidate strings for the per-candidate benchmarks."""
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            # Candidates are saved JSON-encoded, one per line, since they may contain newlines
+            return [json.loads(line) for line in f if line.strip()]
+    if args.archive:
+        return archive_candidates(args.archive)
+    return build_candidate_corpus(load_blessing_texts(args.blessings), size=args.size)
+
+
+def save_corpus(corpus: list[str], path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        for text in corpus:
+            f.write(json.dumps(text, ensure_ascii=False) + "\n")
+    print(f"Saved {len(corpus)} candidates to {path}")
+
+
+# ---------------------------------------------------------------------------
+# Timing helpers
+# ---------------------------------------------------------------------------
+
+
+class Row(NamedTuple):
+    label: str
+    us: float  # best-of-repeat wall time per item
+    kb: float  # peak traced allocation during one pass
+
+
+def time_per_item(fn, items: list, repeat: int = 3, setup=None) -> float:
+    """Best-of-repeat wall time per item, in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1e6
+
+
+def peak_memory_kb(fn, items: list, setup=None) -> float:
+    """Peak Python heap allocated during one untimed pass over items, in KB."""
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        for item in items:
+            fn(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(label: str, fn, items: list, repeat: int = 3, setup=None) -> Row:
+    return Row(label, time_per_item(fn, items, repeat=repeat, setup=setup),
+               peak_memory_kb(fn, items, setup=setup))
+
+
+def report(title: str, rows: list[Row]):
+    """Print a small table of rows with throughput, peak memory and speedup vs the first row."""
+    print(f"\n{title}")
+    print("-" * 76)
+    base = rows[0].us
+    for label, us, kb in rows:
+        print(f"  {label:<28} {us:>9.2f} us/item {1e6 / us:>10.0f}/s {kb:>9.0f} KB  x{base / us:>5.2f}")
+
+
+# ---------------------------------------------------------------------------
+# Reference implementations (pre-optimisation versions, used for parity)
+# ---------------------------------------------------------------------------
+
+
+def legacy_has_blessing_keywords(text: str, min_count: int = 2) -> bool:
+    return sum(1 for kw in sb.BLESSING_KEYWORDS if kw in text) >= min_count
+
+
+def legacy_detect_style(text: str) -> str | None:
+    if sb.count_chinese_chars(text) <= 36:
+        return "brief"
+    scores = {}
+    for style, keywords in sb.STYLE_INDICATORS.items():
+        if style == "brief":
+            continue
+        score = sum(1 for kw in keywords if kw in text)
+        if score > 0:
+            scores[style] = score
+    return max(scores, key=scores.get) if scores else None
+
+
+def legacy_detect_relationship(text: str) -> str | None:
+    scores = {}
+    for rel, keywords in sb.REL_INDICATORS.items():
+        score = sum(1 for kw in keywords if kw in text)
+        if score > 0:
+            scores[rel] = score
+    return max(scores, key=scores.get) if scores else None
+
+
+def legacy_has_noise(text: str) -> bool:
+    return any(pat.search(text) for pat in sb.NOISE_PATTERNS)
+
+
+def legacy_decode(content: bytes, declared: str | None) -> str:
+    """fetch_page's old chain: declared > apparent_encoding (whole body) > utf-8/gbk/gb2312."""
+    if declared and declared.lower() not in ("iso-8859-1",):
+        return str(content, declared, errors="replace")
+    apparent = sb.requests.compat.chardet.detect(content)["encoding"]
+    if apparent:
+        return str(content, apparent, errors="replace")
+    for enc in ("utf-8", "gbk", "gb2312", "gb18030"):
+        try:
+            return content.decode(enc)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return content.decode("utf-8", errors="replace")
+
+
+def legacy_get_blessings(blessings: dict, rel: str, style: str, length: str) -> list[dict]:
+    """Per-request scan with relaxing fallbacks, as consumers of blessings.json do it."""
+    exact = blessings[rel][style][length]
+    if exact:
+        return exact
+    relaxed = [item for items in blessings[rel][style].values() for item in items]
+    if relaxed:
+        return relaxed
+    relaxed = [item for lengths in blessings[rel].values() for items in lengths.values() for item in items]
+    if relaxed:
+        return relaxed
+    return [item for other, styles in blessings.items() if other != rel
+            for items in styles[style].values() for item in items]
+
+
+def legacy_clean_blessing_text(text: str) -> str:
+    text = re.sub(r"^[\d一二三四五六七八九十]+[、.．）)]\s*", "", text)
+    text = re.sub(r"^\s*[（(]\d+[)）]\s*", "", text)
+    text = text.strip()
+    text = re.sub(r"^[—\-–]+\s*", "", text)
+    text = re.sub(r"\s*[—\-–]+$", "", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+
+def bench_keywords(ctx: "BenchContext"):
+    """Keyword detection: per-keyword substring scans vs the Aho-Corasick matcher."""
+    corpus = ctx.corpus
+    def legacy(text):
+        return (legacy_has_blessing_keywords(text), legacy_detect_style(text),
+                legacy_detect_relationship(text))
+
+    def matcher(text):
+        return (sb.has_blessing_keywords(text), sb.detect_style(text),
+                sb.detect_relationship(text))
+
+    mismatches = sum(1 for text in corpus if legacy(text) != matcher(text))
+    rows = [
+        measure("legacy kw-in-text loops", legacy, corpus),
+        measure("Aho-Corasick matcher", matcher, corpus, setup=sb.scan_keywords.cache_clear),
+    ]
+    ctx.report("keywords", f"keywords: has_blessing_keywords + detect_style + detect_relationship "
+           f"({len(corpus)} candidates)", rows)
+    ctx.parity("keywords", mismatches)
+
+
+def bench_noise(ctx: "BenchContext"):
+    """Noise detection: one regex per rule vs the combined NoiseFilter."""
+    corpus = ctx.corpus
+    mismatches = sum(1 for text in corpus if legacy_has_noise(text) != sb.has_noise(text))
+    rows = [
+        measure("legacy per-pattern loop", legacy_has_noise, corpus),
+        measure("combined NoiseFilter", sb.has_noise, corpus),
+    ]
+    ctx.report("noise", f"noise: has_noise ({len(corpus)} candidates)", rows)
+    ctx.parity("noise", mismatches)
+
+    fired: dict[int, int] = {}
+    for text in corpus:
+        rule = sb.noise_rule(text)
+        if rule is not None:
+            fired[rule] = fired.get(rule, 0) + 1
+    for rule, count in sorted(fired.items(), key=lambda kv: -kv[1]):
+        print(f"  rule {rule:>2} {sb.NOISE_PATTERNS[rule].pattern[:32]:<32} {count:>7} hits")
+
+
+def bench_clean(ctx: "BenchContext"):
+    """Candidate cleaning: inline re.sub calls vs pre-compiled patterns."""
+    corpus = ctx.corpus
+    mismatches = sum(1 for text in corpus
+                     if legacy_clean_blessing_text(text) != sb.clean_blessing_text(text))
+    rows = [
+        measure("legacy inline re.sub", legacy_clean_blessing_text, corpus),
+        measure("pre-compiled patterns", sb.clean_blessing_text, corpus),
+    ]
+    ctx.report("clean", f"clean: clean_blessing_text ({len(corpus)} candidates)", rows)
+    ctx.parity("clean", mismatches)
+
+
+def bench_filter_stage(ctx: "BenchContext"):
+    """Whole per-candidate filtering stage: clean -> has_noise, legacy vs compiled."""
+    corpus = ctx.corpus
+    def legacy(text):
+        return legacy_has_noise(legacy_clean_blessing_text(text))
+
+    def compiled(text):
+        return sb.has_noise(sb.clean_blessing_text(text))
+
+    rows = [
+        measure("legacy clean + noise", legacy, corpus),
+        measure("compiled clean + noise", compiled, corpus),
+    ]
+    ctx.report("filter-stage", f"filter stage: clean_blessing_text + has_noise ({len(corpus)} candidates)", rows)
+
+
+def bench_filter(ctx: "BenchContext"):
+    """Quality filter: filter_blessing on already-cleaned candidates."""
+    cleaned = [sb.clean_blessing_text(text) for text in ctx.corpus]
+    rows = [measure("filter_blessing", sb.filter_blessing, cleaned, setup=sb.scan_keywords.cache_clear)]
+    passed = sum(map(sb.filter_blessing, cleaned))
+    ctx.report("filter", f"filter: filter_blessing ({len(cleaned)} candidates, {passed} pass)", rows)
+
+
+def bench_features(ctx: "BenchContext"):
+    """Candidate scoring: scalar filter/style/relationship per text vs the NumPy batch stage.
+
+    Batched rows time whole batches and report the cost per candidate.
+    """
+    if sb.np is None:
+        print("\nfeatures: numpy not installed, skipped")
+        return
+    cleaned = [sb.clean_blessing_text(text) for text in ctx.corpus]
+    def scalar(text):
+        return sb.filter_blessing(text), sb.detect_style(text), sb.detect_relationship(text)
+
+    def batch(texts):
+        features = sb.text_features(texts)
+        return list(zip(sb.filter_blessing_batch(texts, features),
+                        sb.detect_style_batch(texts, features),
+                        sb.detect_relationship_batch(texts, features)))
+
+    mismatches = sum(1 for text, row in zip(cleaned, batch(cleaned)) if scalar(text) != row)
+    rows = [measure("scalar per text", scalar, cleaned, setup=sb.scan_keywords.cache_clear)]
+    for size in [*FEATURE_BATCH_SIZES, len(cleaned)]:
+        batches = [cleaned[i:i + size] for i in range(0, len(cleaned), size)]
+        per_batch = measure(f"batch of {size}", batch, batches)
+        rows.append(Row(per_batch.label, per_batch.us * len(batches) / len(cleaned), per_batch.kb))
+    ctx.report("features", f"features: filter_blessing + detect_style + detect_relationship "
+               f"({len(cleaned)} candidates)", rows)
+    ctx.parity("features", mismatches)
+
+
+def bench_extract(ctx: "BenchContext"):
+    """HTML extraction: BeautifulSoup four-pass extractor vs the streaming lxml one.
+
+    Doubles as the parity check for the lxml backend: both must return the
+    same candidates in the same order on every page.
+    """
+    pages = ctx.pages
+    mismatched = [i for i, html in enumerate(pages)
+                  if sb.extract_blessings_from_html(html) != sb.extract_blessings_streaming(html)]
+    total_kb = sum(len(html.encode("utf-8")) for html in pages) / 1024
+    rows = [
+        measure("bs4 extractor", sb.extract_blessings_from_html, pages, repeat=2),
+        measure("streaming lxml extractor", sb.extract_blessings_streaming, pages, repeat=2),
+    ]
+    ctx.report("extract", f"extract: extract_blessings_from_html ({len(pages)} pages, {total_kb:.0f} KB)", rows)
+    ctx.parity("extract", len(mismatched), f"pages differ: {mismatched[:10]}")
+
+
+def bench_encoding(ctx: "BenchContext"):
+    """Response decoding: whole-body charset detection vs the EncodingResolver.
+
+    Parity: both paths must return the same text for every page. A fresh
+    resolver is used per timing run, so host memory is learned, not preloaded.
+    """
+    fixtures = ctx.encoded_pages
+    resolver = sb.EncodingResolver()
+
+    def reset():
+        nonlocal resolver
+        resolver = sb.EncodingResolver()
+
+    def legacy(item):
+        return legacy_decode(item[2], item[1])
+
+    def resolve(item):
+        return resolver.decode(item[2], item[1], item[0])
+
+    mismatched = [i for i, item in enumerate(fixtures) if legacy(item) != resolve(item)]
+    total_kb = sum(len(item[2]) for item in fixtures) / 1024
+    rows = [
+        measure("apparent_encoding chain", legacy, fixtures, repeat=2),
+        measure("EncodingResolver", resolve, fixtures, repeat=2, setup=reset),
+    ]
+    ctx.report("encoding", f"encoding: fetch_page decoding ({len(fixtures)} pages, {total_kb:.0f} KB)", rows)
+    ctx.parity("encoding", len(mismatched), f"pages differ: {mismatched[:10]}")
+
+
+def bench_dedup(ctx: "BenchContext"):
+    """Near-duplicate check against one bucket: brute-force is_similar vs NearDuplicateIndex.
+
+    Half the queries are perturbed copies of texts in the bucket, half are
+    new texts. Agreement is reported rather than parity, since LSH may miss
+    a pair that only just clears the difflib threshold. Buckets of up to
+    LINEAR_SCAN_MAX texts are scanned linearly by the index itself.
+    """
+    rng = random.Random(2026)
+    pool = build_synthetic_blessings(load_blessing_texts(ctx.args.blessings),
+                                     max(DEDUP_BUCKET_SIZES) + 200)
+    fresh = pool[max(DEDUP_BUCKET_SIZES):]
+    for size in DEDUP_BUCKET_SIZES:
+        bucket = pool[:size]
+        queries = [perturb(rng.choice(bucket), rng) if i % 2 else fresh[i % len(fresh)]
+                   for i in range(min(200, max(20, 20000 // size)))]
+        index = sb.NearDuplicateIndex(threshold=sb.SIMILARITY_THRESHOLD)
+        for text in bucket:
+            index.add(sb.normalize_text(text))
+
+        def brute(text):
+            return sb.is_similar(text, bucket)
+
+        def indexed(text):
+            return index.find_similar(sb.normalize_text(text)) is not None
+
+        agree = sum(brute(q) == indexed(q) for q in queries)
+        rows = [
+            measure("brute-force is_similar", brute, queries, repeat=1),
+            measure("NearDuplicateIndex", indexed, queries),
+        ]
+        ctx.report(f"dedup-{size}", f"dedup: bucket of {size} ({len(queries)} queries)", rows)
+        print(f"  agreement: {agree}/{len(queries)}")
+
+
+def synthetic_scraper(tmp: Path, texts: list[str]) -> "sb.BlessingScraper":
+    """A scraper whose in-memory store holds texts, spread round-robin over the 90 buckets."""
+    buckets = [(rel, style, length) for rel in sb.RELATIONSHIPS for style in sb.STYLES
+               for length in sb.LENGTHS]
+    scraper = sb.BlessingScraper(store=sb.MemoryCorpus(sb.BlessingJournal(tmp / "j.jsonl")))
+    for i, text in enumerate(texts):
+        rel, style, length = buckets[i % len(buckets)]
+        scraper.store.blessings[rel][style][length].append(
+            {"text": text, "char_count": sb.count_chinese_chars(text),
+             "source_url": f"https://example.com/{i // 20}"})
+    return scraper
+
+
+def bench_save(ctx: "BenchContext"):
+    """blessings.json compaction (_save_output) at increasing corpus sizes, per blessing."""
+    texts = build_synthetic_blessings(load_blessing_texts(ctx.args.blessings), max(SAVE_CORPUS_SIZES))
+    output_file = sb.OUTPUT_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        sb.OUTPUT_FILE = Path(tmp) / "blessings.json"
+        try:
+            for size in SAVE_CORPUS_SIZES:
+                scraper = synthetic_scraper(Path(tmp), texts[:size])
+
+                def save(_):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        scraper._save_output()
+
+                row = measure(f"_save_output x{size}", save, [None], repeat=3)
+                # Report per blessing so sizes are comparable
+                rows = [Row(row.label, row.us / size, row.kb)]
+                ctx.report(f"save-{size}", f"save: _save_output, {size} blessings "
+                           f"({sb.OUTPUT_FILE.stat().st_size / 1024:.0f} KB written)", rows)
+                scraper.close()
+        finally:
+            sb.OUTPUT_FILE = output_file
+
+
+def payload_sizes(body: bytes) -> str:
+    variants = sb.precompress(body)
+    sizes = [f"{len(body) / 1024:.1f} KB"]
+    sizes += [f"{ext} {len(variants[ext]) / 1024:.1f} KB" for ext in ("gz", "br") if ext in variants]
+    return ", ".join(sizes)
+
+
+def bench_export(ctx: "BenchContext"):
+    """First-load payload: monolithic blessings.json vs manifest + one bucket shard.
+
+    Parse time is json.loads per load, as a stand-in for the browser's
+    JSON.parse; the shard is the largest one, i.e. the worst bucket to open.
+    """
+    with open(ctx.args.blessings, "rb") as f:
+        shipped = f.read()
+    texts = build_synthetic_blessings(load_blessing_texts(ctx.args.blessings), max(EXPORT_CORPUS_SIZES))
+    output_file = sb.OUTPUT_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        sb.OUTPUT_FILE = Path(tmp) / "blessings.json"
+        try:
+            for size in [None, *EXPORT_CORPUS_SIZES]:
+                export_dir = Path(tmp) / f"export-{size}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if size is None:
+                        monolith = shipped
+                        sb.export_shards(sb.iter_buckets(json.loads(shipped)["blessings"]), export_dir)
+                    else:
+                        scraper = synthetic_scraper(Path(tmp), texts[:size])
+                        scraper._save_output()
+                        scraper.export(export_dir)
+                        scraper.close()
+                        monolith = sb.OUTPUT_FILE.read_bytes()
+                manifest = (export_dir / sb.EXPORT_MANIFEST).read_bytes()
+                files = json.loads(manifest)["files"].values()
+                largest = max(files, key=lambda entry: entry["bytes"])
+                shard = (export_dir / largest["file"]).read_bytes()
+
+                name = "shipped" if size is None else str(size)
+                rows = [measure("blessings.json", json.loads, [monolith], repeat=5),
+                        measure("manifest + largest shard", lambda _: (json.loads(manifest), json.loads(shard)),
+                                [None], repeat=5)]
+                ctx.report(f"export-{name}", f"export: first load, {name} corpus ({len(files)} shards)", rows)
+                print(f"  blessings.json: {payload_sizes(monolith)}")
+                print(f"  manifest:       {payload_sizes(manifest)}")
+                print(f"  largest shard:  {payload_sizes(shard)}")
+        finally:
+            sb.OUTPUT_FILE = output_file
+
+
+def bench_index(ctx: "BenchContext"):
+    """(rel, style, length) lookups: per-request scan + fallback vs BlessingIndex, per lookup."""
+    with open(ctx.args.blessings, "r", encoding="utf-8") as f:
+        shipped = json.load(f)["blessings"]
+    texts = build_synthetic_blessings(load_blessing_texts(ctx.args.blessings), 100000)
+    dense = sb._empty_buckets()
+    combos = [(rel, style, length) for rel in sb.RELATIONSHIPS for style in sb.STYLES
+              for length in sb.LENGTHS]
+    for i, text in enumerate(texts):
+        rel, style, length = combos[i % len(combos)]
+        dense[rel][style][length].append({"text": text, "char_count": sb.count_chinese_chars(text)})
+    rng = random.Random(2026)
+    lookups = [rng.choice(combos) for _ in range(INDEX_LOOKUPS)]
+
+    for name, blessings in [("shipped", shipped), ("100000", dense)]:
+        size = sum(len(items) for styles in blessings.values() for lengths in styles.values()
+                   for items in lengths.values())
+        build = measure("BlessingIndex build", BlessingIndex, [blessings], repeat=3)
+        index = BlessingIndex(blessings)
+        session = index.session(2026)
+        def scan(query):
+            entries = legacy_get_blessings(blessings, *query)
+            return random.sample(entries, min(3, len(entries)))
+
+        rows = [measure("scan + random.sample(3)", scan, lookups),
+                measure("index.resolve", lambda q: index.resolve(*q), lookups),
+                measure("index.sample(3)", lambda q: index.sample(*q, n=3), lookups),
+                measure("index.sample(3, session)", lambda q: index.sample(*q, n=3, session=session),
+                        lookups)]
+        ctx.report(f"index-{name}", f"index: lookups, {name} corpus ({size} blessings, "
+                   f"{sum(1 for n in index.sizes if not n)} empty buckets; "
+                   f"build {build.us / 1000:.1f} ms, {build.kb:.0f} KB)", rows)
+
+
+BENCHMARKS = {
+    "keywords": bench_keywords,
+    "noise": bench_noise,
+    "clean": bench_clean,
+    "filter-stage": bench_filter_stage,
+    "filter": bench_filter,
+    "features": bench_features,
+    "extract": bench_extract,
+    "encoding": bench_encoding,
+    "dedup": bench_dedup,
+    "save": bench_save,
+    "export": bench_export,
+    "index": bench_index,
+}
+
+
+class BenchContext:
+    """Lazily built inputs shared by the benchmarks."""
+
+    def __init__(self, args):
+        self.args = args
+        self._corpus = None
+        self._pages = None
+        self._encoded_pages = None
+        self.baseline = None
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                self.baseline = json.load(f)
+        self.results: dict[str, dict[str, dict[str, float]]] = {}
+        self.regressions: list[str] = []
+        self.parity_failures: list[str] = []
+
+    def report(self, name: str, title: str, rows: list[Row]):
+        """Print rows, keep them for --save-baseline and compare with --baseline."""
+        report(title, rows)
+        self.results[name] = {row.label: {"us": round(row.us, 4), "kb": round(row.kb, 1)}
+                              for row in rows}
+        if self.baseline is None:
+            return
+        for row in rows:
+            old = self.baseline.get(name, {}).get(row.label)
+            if old is None:
+                continue
+            change = (row.us / old["us"] - 1) * 100
+            flag = ""
+            if change > self.args.tolerance:
+                flag = "  REGRESSION"
+                self.regressions.append(f"{name}: {row.label} {change:+.1f}%")
+            print(f"  vs baseline: {row.label:<28} {old['us']:>9.2f} -> {row.us:.2f} us "
+                  f"({change:+.1f}%), {old['kb']:.0f} -> {row.kb:.0f} KB{flag}")
+
+    def parity(self, name: str, mismatches: int, detail: str = ""):
+        """Print a parity result; any mismatch makes the run exit with status 1."""
+        if not mismatches:
+            print("  parity: OK")
+            return
+        print(f"  parity: {mismatches} MISMATCHES {detail}".rstrip())
+        self.parity_failures.append(f"{name}: {mismatches} mismatches")
+
+    @property
+    def corpus(self) -> list[str]:
+        if self._corpus is None:
+            self._corpus = load_corpus(self.args)
+        return self._corpus
+
+    @property
+    def pages(self) -> list[str]:
+        if self._pages is None:
+            if self.args.archive:
+                self._pages = archive_pages(self.args.archive)
+            else:
+                self._pages = build_html_fixtures(load_blessing_texts(self.args.blessings))
+        return self._pages
+
+    @property
+    def encoded_pages(self) -> list[tuple[str, str | None, bytes]]:
+        if self._encoded_pages is None:
+            if self.args.raw_pages:
+                self._encoded_pages = load_raw_pages(self.args.raw_pages)
+            else:
+                self._encoded_pages = build_encoded_fixtures(self.pages)
+        return self._encoded_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="祝福语爬虫离线基准测试")
+    parser.add_argument("benchmarks", nargs="*", metavar="NAME",
+                        help=f"要运行的基准(默认全部): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--blessings", type=Path, default=DEFAULT_BLESSINGS_FILE,
+                        help="用于合成语料的 blessings.json")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="保存的候选文本文件(每行一条 JSON 字符串)，代替合成语料")
+    parser.add_argument("--archive", type=Path, default=None,
+                        help="使用页面归档(pages.jsonl.gz)中的真实页面及其候选作为语料")
+    parser.add_argument("--raw-pages", type=Path, default=None,
+                        help="保存的原始页面目录(<目录>/<域名>/<文件>)，用于 encoding 基准")
+    parser.add_argument("--save-corpus", type=Path, default=None,
+                        help="把使用的候选语料保存到文件，供之后 --corpus 复用")
+    parser.add_argument("--size", type=int, default=20000, help="合成候选语料条数")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="与保存的基线结果(JSON)对比，慢于容差时报告退化并以状态 1 退出")
+    parser.add_argument("--save-baseline", type=Path, default=None,
+                        help="把本次结果保存为基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help=f"判定退化的变慢百分比 (默认 {REGRESSION_TOLERANCE:.0f})")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    ctx = BenchContext(args)
+    if args.save_corpus:
+        save_corpus(ctx.corpus, args.save_corpus)
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](ctx)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(ctx.results, f, ensure_ascii=False, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if ctx.regressions:
+        print(f"\n{len(ctx.regressions)} regression(s) over {args.tolerance:.0f}%:")
+        for line in ctx.regressions:
+            print(f"  - {line}")
+    if ctx.parity_failures:
+        print(f"\n{len(ctx.parity_failures)} parity failure(s):")
+        for line in ctx.parity_failures:
+            print(f"  - {line}")
+    if ctx.regressions or ctx.parity_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,22 +9,69 @@ Usage:
     python scripts/scrape_blessings.py              # 完整爬取
     python scripts/scrape_blessings.py --resume      # 断点续爬
     python scripts/scrape_blessings.py --stats       # 查看已有数据覆盖率
+    python scripts/scrape_blessings.py --compact     # 由追加日志重新生成 blessings.json
+    python scripts/scrape_blessings.py --export      # 导出 manifest + 分片 JSON(前端按需加载、长期缓存)
+    python scripts/scrape_blessings.py --export --export-from blessings.json --export-dir public/blessings
+    python scripts/scrape_blessings.py --store sqlite --target 200  # SQLite 存储，大目标量
+    python scripts/scrape_blessings.py --shared-pool # 每页候选分类一次，分配到所有未满分类
+    python scripts/scrape_blessings.py --adaptive --shared-pool  # 按产出自适应调度搜索词
     python scripts/scrape_blessings.py --dry-run     # 只显示搜索词不实际爬取
+    python scripts/scrape_blessings.py --profile     # cProfile 热点分析；各阶段耗时见 output/metrics.json
+    python scripts/scrape_blessings.py --workers 8   # 多线程并发抓取(按域名限速)
+    python scripts/scrape_blessings.py --workers 8 --cpu-workers 4  # 页面提取/分类交给进程池
+    python scripts/scrape_blessings.py --cached-only # 离线：只用本地缓存页面重跑提取
+    python scripts/scrape_blessings.py --reprocess   # 离线：用归档的原始页面多进程重建输出
 """
 
 import argparse
+import codecs
+import cProfile
+import multiprocessing
 import difflib
+import hashlib
+import gzip
 import json
+import os
+import pstats
 import random
 import re
+import sqlite3
+import struct
+import sys
+import threading
 import time
 import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import quote
+from typing import NamedTuple
+from urllib.parse import parse_qsl, quote, unquote_plus, urlencode, urlsplit, urlunsplit
 
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode Content-Encoding: br)
+except ImportError:
+    brotli = None
+
+try:
+    import numpy as np
+except ImportError:  # batch feature stage falls back to the scalar functions
+    np = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -34,6 +81,22 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = SCRIPT_DIR / "output"
 OUTPUT_FILE = OUTPUT_DIR / "blessings.json"
 PROGRESS_FILE = OUTPUT_DIR / "scrape_progress.json"
+HTTP_CACHE_DIR = OUTPUT_DIR / "http_cache"
+PAGE_ARCHIVE_FILE = OUTPUT_DIR / "pages.jsonl.gz"
+JOURNAL_FILE = OUTPUT_DIR / "blessings.journal.jsonl"
+CORPUS_DB_FILE = OUTPUT_DIR / "blessings.db"
+FRONTIER_FILE = OUTPUT_DIR / "frontier.json"
+SEARCH_STATS_FILE = OUTPUT_DIR / "search_stats.json"
+GOVERNOR_FILE = OUTPUT_DIR / "governor.json"
+METRICS_FILE = OUTPUT_DIR / "metrics.json"
+SERP_CACHE_FILE = OUTPUT_DIR / "serp_cache.json"
+REDIRECT_CACHE_FILE = OUTPUT_DIR / "redirects.json"
+EXPORT_DIR = OUTPUT_DIR / "export"
+PROFILE_FILE = OUTPUT_DIR / "profile.pstats"
+
+# Search engine endpoints; --search-base points both at a local stub server
+WEIXIN_SEARCH_BASE = "https://weixin.sogou.com"
+SOGOU_SEARCH_BASE = "https://www.sogou.com"
 
 RELATIONSHIPS = ["elder", "colleague", "leader", "friend", "partner", "customer"]
 STYLES = ["formal", "casual", "funny", "literary", "brief"]
@@ -41,6 +104,140 @@ LENGTHS = ["short", "medium", "long"]
 
 TARGET_PER_BUCKET = 10
 
+# Near-duplicate detection: difflib ratio above this counts as "same blessing"
+SIMILARITY_THRESHOLD = 0.85
+
+# Threshold for near-duplicates found in a *different* bucket (same text
+# reworded across relationships/styles). Overridable with --dedup-threshold.
+GLOBAL_SIMILARITY_THRESHOLD = 0.85
+
+# MinHash/LSH parameters for the near-duplicate index. Character bigrams with
+# 24 bands x 3 rows catch every pair above SIMILARITY_THRESHOLD in our
+# perturbation tests while returning well under 1% of unrelated pairs.
+SHINGLE_SIZE = 2
+LSH_BANDS = 24
+LSH_ROWS = 3
+# Below this many stored texts a straight difflib scan beats MinHash + LSH:
+# one signature costs about as much as two dozen ratio checks, so small
+# indexes compare against everything and only compute signatures once
+# they grow past it.
+LINEAR_SCAN_MAX = 24
+
+# Per-host politeness delay (seconds) between two page fetches to the same host
+PAGE_DELAY = (1, 3)
+
+# HTTP response cache: pages younger than the TTL are served without any
+# request, older ones are revalidated with If-None-Match/If-Modified-Since
+HTTP_CACHE_TTL = 7 * 24 * 3600
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# HTTP transport: one keep-alive pool per host, at least as deep as the
+# number of fetch threads. Idempotent GETs are retried on connection errors
+# and 5xx with exponential backoff (honouring Retry-After); 429 and anti-bot
+# pages are left to the RateGovernor instead.
+HTTP_POOL_HOSTS = 32
+HTTP_POOL_MIN_SIZE = 4
+HTTP_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.5
+HTTP_RETRY_STATUSES = (500, 502, 503, 504)
+# Sogou /link pages are read in chunks until the url fragments are complete.
+# Until the first fragment shows up, each chunk is scanned together with the
+# last REDIRECT_SCAN_OVERLAP characters (far longer than one fragment).
+REDIRECT_CHUNK_SIZE = 1024
+REDIRECT_MAX_BYTES = 64 * 1024
+REDIRECT_SCAN_OVERLAP = 256
+
+# Article identity: a Sogou /link resolution is remembered for
+# REDIRECT_CACHE_TTL, keyed by the link's url= token (the click parameters
+# k/h differ per result page). Articles are compared by canonical URL: for
+# mp.weixin.qq.com/s?... only WEIXIN_ARTICLE_PARAMS identify the article,
+# the rest (chksm, scene, srcid, sharer_*, ...) is share/tracking noise.
+REDIRECT_CACHE_TTL = 30 * 24 * 3600
+WEIXIN_ARTICLE_PARAMS = ("__biz", "mid", "idx", "sn")
+TRACKING_PARAM_PREFIXES = ("utm_",)
+# Search results are resolved RESOLVE_AHEAD (at least 2 x workers) at a time,
+# just ahead of fetching them, so a combo that fills early resolves no more.
+RESOLVE_AHEAD = 5
+
+# Page bodies are streamed in PAGE_CHUNK_SIZE chunks and cut at
+# PAGE_MAX_BYTES (--max-page-kb), or as soon as the article is over: after
+# </body>, or at the toolbar/QR-code block that follows a WeChat article's
+# js_content (the rest of those pages is inline JS data). Responses whose
+# Content-Type is not HTML are dropped before the body is read.
+PAGE_MAX_BYTES = 2 * 1024 * 1024
+PAGE_CHUNK_SIZE = 64 * 1024
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+# --cpu-workers / --reprocess: pages queued per extraction process. Bounds
+# how far fetching (or archive reading) can run ahead of the writer.
+CPU_QUEUE_DEPTH = 4
+
+# Response decoding for pages without a usable Content-Type charset: only the
+# first ENCODING_SNIFF_BYTES are searched for a BOM / <meta charset>, and
+# statistical detection (the slow path) only sees ENCODING_DETECT_BYTES.
+ENCODING_SNIFF_BYTES = 4096
+ENCODING_DETECT_BYTES = 16 * 1024
+# Labels decoded with a superset codec, as browsers do (GB2312 pages are GBK)
+ENCODING_ALIASES = {"gb2312": "gbk", "x-gbk": "gbk", "x-gb2312": "gbk", "csgb2312": "gbk"}
+
+# URL frontier: pages that failed FRONTIER_MAX_FAILURES times in a row, or had
+# no candidates, are not refetched until FRONTIER_RECHECK has passed.
+# PAGE_MEMO_SIZE pages' candidates are kept per run so that a page wanted by
+# several combos is only fetched and extracted once.
+FRONTIER_RECHECK = 7 * 24 * 3600
+FRONTIER_MAX_FAILURES = 3
+PAGE_MEMO_SIZE = 1024
+
+# Adaptive query scheduler (--adaptive): a query stops paginating once a
+# result page yields fewer than SCHEDULER_MIN_YIELD accepted blessings per
+# request (the SERP request plus the articles fetched from it); engine page
+# numbers whose history (>= SCHEDULER_MIN_SAMPLES) is below that are not
+# requested at all. A combo is given up for the run after
+# SCHEDULER_MAX_IDLE queries in a row added nothing to it. Missing long
+# blessings weigh LONG_DEFICIT_WEIGHT times as much as short/medium ones.
+SCHEDULER_MIN_YIELD = 0.1
+SCHEDULER_MIN_SAMPLES = 5
+SCHEDULER_MAX_IDLE = 4
+LONG_DEFICIT_WEIGHT = 2.0
+
+# Search result (SERP) cache: parsed result links per (engine, canonical
+# query, page) are reused for SERP_CACHE_TTL, so re-runs send no searches.
+# Canonical queries drop filler words, sort the remaining terms and (for
+# build_queries' random picks) map relationship/style synonyms to their label.
+SERP_CACHE_TTL = 3 * 24 * 3600
+QUERY_FILLERS = frozenset(["精选", "最新", "经典", "大全", "集锦"])
+
+# Sharded export (--export): manifest.json plus one compact JSON file per
+# bucket (or per relationship) named <key>.<content hash>.json, with .gz/.br
+# variants. Shards only carry EXPORT_FIELDS; source URLs and stats stay in
+# blessings.json.
+EXPORT_MANIFEST = "manifest.json"
+EXPORT_FIELDS = ("text", "char_count")
+EXPORT_HASH_CHARS = 10
+EXPORT_SHARD_RE = re.compile(r"^[a-z_]+(?:\.[a-z_]+){0,2}\.[0-9a-f]{%d}\.json(?:\.gz|\.br)?$"
+                             % EXPORT_HASH_CHARS)
+
+# Batch feature stage (classify_candidates): texts are featurized
+# BATCH_CHUNK_CHARS characters at a time, bounding the temporary arrays.
+BATCH_CHUNK_CHARS = 1 << 20
+
+# Search engine rate governor: seconds between requests per engine as
+# (min, initial, max). Each clean response shortens the gap by
+# GOVERNOR_STEP seconds; an anti-bot page doubles it and opens the engine's
+# circuit for GOVERNOR_COOLDOWN seconds, doubling per consecutive block up
+# to GOVERNOR_MAX_COOLDOWN.
+ENGINE_PACING = {
+    "weixin": (8.0, 15.0, 120.0),
+    "sogou": (2.0, 3.0, 60.0),
+}
+GOVERNOR_STEP = 0.5
+GOVERNOR_COOLDOWN = 180
+GOVERNOR_MAX_COOLDOWN = 3600
+# Without a governor, a blocked search page is retried in place up to
+# SEARCH_BLOCK_ATTEMPTS times, sleeping SEARCH_BLOCK_BACKOFF seconds x attempt.
+SEARCH_BLOCK_ATTEMPTS = 3
+SEARCH_BLOCK_BACKOFF = (120, 300)
+
 # Chinese labels matching src/types.ts
 REL_LABELS = {
     "elder": "长辈",
@@ -182,6 +379,30 @@ NOISE_PATTERNS = [
     re.compile(r"阅读全文|展开全部|查看更多"),
 ]
 
+# Pre-compiled extraction / cleaning patterns (hot path: run on every candidate)
+WHITESPACE_RE = re.compile(r"\s+")
+NUMBERED_SPLIT_RE = re.compile(r"[\d一二三四五六七八九十]+[、.．）)]\s*")
+LINE_NUMBER_PREFIX_RE = re.compile(r"^[\d一二三四五六七八九十]+[、.．）)\.]?\s*")
+CONTENT_CLASS_RE = re.compile(r"content|text|article|blessing|item|card|post|entry|body", re.I)
+NUMBER_PREFIX_RE = re.compile(r"^[\d一二三四五六七八九十]+[、.．）)]\s*")
+PAREN_NUMBER_PREFIX_RE = re.compile(r"^\s*[（(]\d+[)）]\s*")
+LEADING_DASH_RE = re.compile(r"^[—\-–]+\s*")
+TRAILING_DASH_RE = re.compile(r"\s*[—\-–]+$")
+INLINE_SPACE_RE = re.compile(r"[ \t]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+SOGOU_URL_FRAGMENT_RE = re.compile(r"url\s*\+=\s*'([^']*)'")
+ARTICLE_END_RE = re.compile(
+    rb"""</body\s*>|<div[^>]+(?:id\s*=\s*["']js_pc_qr_code|class\s*=\s*["']rich_media_tool)""", re.I)
+ARTICLE_END_OVERLAP = 512
+META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]+?charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)|<\?xml[^>]+encoding\s*=\s*["']([A-Za-z0-9_.:-]+)""",
+    re.I)
+SOGOU_URL_FRAGMENT_NEXT_RE = re.compile(r"[\s;]*(?:u(?:r(?:l(?:\s*(?:\+=?)?)?)?)?)?$|[\s;]*url\s*\+=")
+# Tags whose content is never blessing text (dropped before extraction)
+_EXTRACT_SKIP_TAGS = frozenset(["script", "style", "nav", "footer", "header", "aside", "form"])
+
+WEIXIN_ARTICLE_URL_RE = re.compile(r'(https?://mp\.weixin\.qq\.com/s[^\s"\'<>]+)')
+
 # User-Agent rotation pool
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -191,6 +412,184 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
 ]
 
+# ---------------------------------------------------------------------------
+# Keyword matching (single-pass Aho-Corasick automaton)
+# ---------------------------------------------------------------------------
+
+
+class KeywordHits(NamedTuple):
+    """Keyword scores of one text, as the old per-keyword `kw in text` loops counted them."""
+    blessing: int
+    style: dict[str, int]
+    rel: dict[str, int]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over BLESSING_KEYWORDS, STYLE_INDICATORS and REL_INDICATORS.
+
+    scan() walks the text once and reports which keywords occur; each keyword
+    then adds one point to every list it appears in (the same presence-based
+    scoring as before). Transitions are fully materialised per state, so the
+    inner loop is a single dict lookup per character.
+    """
+
+    def __init__(self, blessing_keywords: list[str], style_indicators: dict[str, list[str]],
+                 rel_indicators: dict[str, list[str]]):
+        self.styles = [s for s, kws in style_indicators.items() if kws]
+        self.rels = list(rel_indicators)
+
+        # Score slots: 0 = blessing keywords, then styles, then relationships
+        slot_lists = [blessing_keywords]
+        slot_lists += [style_indicators[s] for s in self.styles]
+        slot_lists += [rel_indicators[r] for r in self.rels]
+        self._n_slots = len(slot_lists)
+
+        self._slots: dict[str, list[int]] = {}
+        for slot, keywords in enumerate(slot_lists):
+            for kw in keywords:
+                self._slots.setdefault(kw, []).append(slot)
+
+        self._build(list(self._slots))
+
+    def _build(self, keywords: list[str]):
+        goto: list[dict[str, int]] = [{}]
+        output: list[set[str]] = [set()]
+        for kw in keywords:
+            state = 0
+            for ch in kw:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    output.append(set())
+                    nxt = len(goto) - 1
+                    goto[state][ch] = nxt
+                state = nxt
+            output[state].add(kw)
+
+        # BFS for failure links; a state's full transition table is its own
+        # goto edges layered over its failure state's (already complete) table.
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            f = fail[state]
+            output[state] |= output[f]
+            delta[state] = {**delta[f], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[f].get(ch, 0)
+                queue.append(nxt)
+
+        self._delta = delta
+        self._output = [frozenset(o) if o else None for o in output]
+
+    def find(self, text: str) -> set[str]:
+        """Set of keywords occurring anywhere in text."""
+        delta = self._delta
+        output = self._output
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            out = output[state]
+            if out is not None:
+                found |= out
+        return found
+
+    def scan(self, text: str) -> KeywordHits:
+        counts = [0] * self._n_slots
+        slots = self._slots
+        for kw in self.find(text):
+            for slot in slots[kw]:
+                counts[slot] += 1
+        n_styles = len(self.styles)
+        return KeywordHits(
+            blessing=counts[0],
+            style=dict(zip(self.styles, counts[1:1 + n_styles])),
+            rel=dict(zip(self.rels, counts[1 + n_styles:])),
+        )
+
+
+KEYWORD_MATCHER = KeywordMatcher(BLESSING_KEYWORDS, STYLE_INDICATORS, REL_INDICATORS)
+
+
+@lru_cache(maxsize=4096)
+def scan_keywords(text: str) -> KeywordHits:
+    """All keyword scores of text in one automaton pass.
+
+    Cached because filter_blessing, detect_relationship and detect_style are
+    normally called back to back on the same candidate.
+    """
+    return KEYWORD_MATCHER.scan(text)
+
+
+# ---------------------------------------------------------------------------
+# Noise filtering (NOISE_PATTERNS compiled into one alternation)
+# ---------------------------------------------------------------------------
+
+
+class NoiseFilter:
+    """All NOISE_PATTERNS as a single alternation per case mode.
+
+    Case-sensitive rules are joined into one regex searched on the text; the
+    IGNORECASE rules into one searched on text.casefold(). Plain alternations
+    of literals let the regex engine skip ahead on a first-character set,
+    which a per-pattern loop (or a single re.IGNORECASE alternation) cannot.
+    rule() reports which NOISE_PATTERNS entry fired, for diagnostics.
+    """
+
+    def __init__(self, patterns: list[re.Pattern]):
+        self.patterns = patterns
+        self._sensitive_rules = [i for i, p in enumerate(patterns) if not p.flags & re.IGNORECASE]
+        self._folded_rules = [i for i, p in enumerate(patterns) if p.flags & re.IGNORECASE]
+        self._sensitive = self._alternation(self._sensitive_rules)
+        self._folded = self._alternation(self._folded_rules)
+
+    def _alternation(self, rules: list[int]) -> re.Pattern | None:
+        if not rules:
+            return None
+        sources = [self.patterns[i].pattern for i in rules]
+        # Folded rules are matched against casefolded text; keep re.IGNORECASE
+        # only if some rule is not written in lower case already.
+        flags = 0
+        if any(self.patterns[i].flags & re.IGNORECASE for i in rules):
+            if any(src != src.lower() for src in sources):
+                flags = re.IGNORECASE
+        # Joined without (?:...) wrappers: top-level "|" already separates the
+        # rules, and a flat alternation keeps the engine's first-char prefilter.
+        return re.compile("|".join(sources), flags)
+
+    def _match(self, text: str) -> tuple[re.Match, list[int]] | None:
+        if self._sensitive is not None:
+            m = self._sensitive.search(text)
+            if m:
+                return m, self._sensitive_rules
+        if self._folded is not None:
+            m = self._folded.search(text.casefold())
+            if m:
+                return m, self._folded_rules
+        return None
+
+    def search(self, text: str) -> bool:
+        """True if any noise rule matches text."""
+        return self._match(text) is not None
+
+    def rule(self, text: str) -> int | None:
+        """Index of the NOISE_PATTERNS entry that matched text, or None."""
+        hit = self._match(text)
+        if hit is None:
+            return None
+        m, rules = hit
+        for i in rules:
+            if self.patterns[i].fullmatch(m.group()):
+                return i
+        return rules[0]
+
+
+NOISE_FILTER = NoiseFilter(NOISE_PATTERNS)
+
+
 # ---------------------------------------------------------------------------
 # Utility functions
 # ---------------------------------------------------------------------------
@@ -204,7 +603,7 @@ def count_chinese_chars(text: str) -> int:
 def normalize_text(text: str) -> str:
     """Normalize text for deduplication: strip whitespace, normalize unicode."""
     text = unicodedata.normalize("NFKC", text)
-    text = re.sub(r"\s+", "", text)
+    text = WHITESPACE_RE.sub("", text)
     text = text.strip("。！!？?，,、；;：:""''\"'")
     return text
 
@@ -219,25 +618,178 @@ def classify_length(char_count: int) -> str | None:
 
 def has_blessing_keywords(text: str, min_count: int = 2) -> bool:
     """Check if text contains at least min_count blessing keywords."""
-    found = sum(1 for kw in BLESSING_KEYWORDS if kw in text)
-    return found >= min_count
+    return scan_keywords(text).blessing >= min_count
 
 
 def has_noise(text: str) -> bool:
     """Check if text contains noise patterns (ads, navigation, etc.)."""
-    return any(pat.search(text) for pat in NOISE_PATTERNS)
+    return NOISE_FILTER.search(text)
+
 
+def noise_rule(text: str) -> int | None:
+    """Index into NOISE_PATTERNS of the rule that rejects text, or None."""
+    return NOISE_FILTER.rule(text)
 
-def is_similar(text: str, existing: list[str], threshold: float = 0.85) -> bool:
-    """Check if text is too similar to any existing text."""
+
+def is_similar(text: str, existing: list[str], threshold: float = SIMILARITY_THRESHOLD) -> bool:
+    """Check if text is too similar to any existing text.
+
+    Brute-force reference implementation; the scraper itself goes through
+    NearDuplicateIndex, which only runs difflib on LSH candidates.
+    """
     normalized = normalize_text(text)
     for ex in existing:
-        ratio = difflib.SequenceMatcher(None, normalized, normalize_text(ex)).ratio()
-        if ratio > threshold:
+        if ratio_exceeds(normalized, normalize_text(ex), threshold):
             return True
     return False
 
 
+def ratio_exceeds(a: str, b: str, threshold: float = SIMILARITY_THRESHOLD) -> bool:
+    """difflib ratio(a, b) > threshold, checking the cheap upper bounds first."""
+    # ratio() <= 2 * min(len) / (len(a) + len(b)); skip building the matcher
+    # when the lengths alone rule the pair out.
+    total = len(a) + len(b)
+    if total and 2 * min(len(a), len(b)) / total <= threshold:
+        return False
+    matcher = difflib.SequenceMatcher(None, a, b)
+    return (matcher.real_quick_ratio() > threshold
+            and matcher.quick_ratio() > threshold
+            and matcher.ratio() > threshold)
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicate index (MinHash + LSH over character shingles)
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=16384)
+def _shingle_hashes(shingle: str) -> array:
+    """LSH_BANDS * LSH_ROWS independent 32-bit hashes of one shingle.
+
+    One shake_128 digest supplies all of them; the small shingle vocabulary
+    of Chinese blessings makes this cache very effective.
+    """
+    digest = hashlib.shake_128(shingle.encode("utf-8")).digest(4 * LSH_BANDS * LSH_ROWS)
+    return array("I", digest)
+
+
+def minhash_signature(normalized: str) -> tuple[int, ...]:
+    """MinHash signature of a normalized text's character shingles."""
+    n = SHINGLE_SIZE
+    if len(normalized) <= n:
+        grams = {normalized}
+    else:
+        grams = {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+    rows = [_shingle_hashes(g) for g in grams]
+    if len(rows) == 1:
+        return tuple(rows[0])
+    return tuple(map(min, *rows))
+
+
+def lsh_band_keys(signature: tuple[int, ...]) -> list[int]:
+    """One stable signed 64-bit key per LSH band of a signature."""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<H{LSH_ROWS}Q", band, *rows),
+                                 digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+class NearDuplicateIndex:
+    """Near-duplicate lookup for normalized blessing texts.
+
+    Each stored text keeps its normalized form, MinHash signature and an
+    optional tag (the scraper uses the rel/style/length bucket). A query only
+    runs the difflib ratio check against texts that share at least one LSH
+    band with it, so lookups stay close to constant time as the index grows
+    instead of scanning every stored text.
+
+    Band slots hold a bare id until a second text lands in them, which keeps
+    the memory footprint manageable at 100k+ entries.
+
+    Up to LINEAR_SCAN_MAX texts the index is a plain list: lookups check
+    every stored text (exact, and cheaper than hashing the query), and
+    signatures are only computed and banded when it grows past that.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.normalized: list[str] = []
+        self.signatures: list[array | None] = []
+        self.tags: list = []
+        self._bands: dict[int, int | list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    @property
+    def needs_signature(self) -> bool:
+        """Whether the next find_similar/add will use a MinHash signature."""
+        return len(self.normalized) >= LINEAR_SCAN_MAX
+
+    def candidates(self, signature: tuple[int, ...]) -> list[int]:
+        """Ids of stored texts sharing at least one band with signature."""
+        found: dict[int, None] = {}
+        for key in lsh_band_keys(signature):
+            slot = self._bands.get(key)
+            if slot is None:
+                continue
+            if isinstance(slot, int):
+                found[slot] = None
+            else:
+                found.update(dict.fromkeys(slot))
+        return list(found)
+
+    def find_similar(self, normalized: str,
+                     signature: tuple[int, ...] | None = None,
+                     threshold_for=None) -> int | None:
+        """Id of a stored text with ratio > threshold, or None.
+
+        threshold_for(tag) may return a per-candidate threshold instead of
+        self.threshold, e.g. a looser one for texts in the same bucket.
+        """
+        if len(self.normalized) <= LINEAR_SCAN_MAX:
+            candidates = range(len(self.normalized))
+        else:
+            if signature is None:
+                signature = minhash_signature(normalized)
+            candidates = self.candidates(signature)
+        for idx in candidates:
+            threshold = self.threshold if threshold_for is None else threshold_for(self.tags[idx])
+            if ratio_exceeds(normalized, self.normalized[idx], threshold):
+                return idx
+        return None
+
+    def add(self, normalized: str, signature: tuple[int, ...] | None = None,
+            tag=None) -> int:
+        """Store a normalized text and return its id."""
+        idx = len(self.normalized)
+        self.normalized.append(normalized)
+        self.signatures.append(None if signature is None else array("I", signature))
+        self.tags.append(tag)
+        if idx == LINEAR_SCAN_MAX:
+            # Outgrew the linear scan: band everything stored so far
+            for old in range(idx):
+                self._band(old)
+        if idx >= LINEAR_SCAN_MAX:
+            self._band(idx)
+        return idx
+
+    def _band(self, idx: int):
+        if self.signatures[idx] is None:
+            self.signatures[idx] = array("I", minhash_signature(self.normalized[idx]))
+        bands = self._bands
+        for key in lsh_band_keys(self.signatures[idx]):
+            slot = bands.get(key)
+            if slot is None:
+                bands[key] = idx
+            elif isinstance(slot, int):
+                bands[key] = [slot, idx]
+            else:
+                slot.append(idx)
+
+
 def detect_style(text: str) -> str | None:
     """Detect the style of a blessing text based on keyword indicators."""
     cc = count_chinese_chars(text)
@@ -246,13 +798,7 @@ def detect_style(text: str) -> str | None:
     if cc <= 36:
         return "brief"
 
-    scores = {}
-    for style, keywords in STYLE_INDICATORS.items():
-        if style == "brief":
-            continue
-        score = sum(1 for kw in keywords if kw in text)
-        if score > 0:
-            scores[style] = score
+    scores = {style: score for style, score in scan_keywords(text).style.items() if score > 0}
 
     if not scores:
         return None
@@ -261,11 +807,7 @@ def detect_style(text: str) -> str | None:
 
 def detect_relationship(text: str) -> str | None:
     """Detect the target relationship of a blessing text."""
-    scores = {}
-    for rel, keywords in REL_INDICATORS.items():
-        score = sum(1 for kw in keywords if kw in text)
-        if score > 0:
-            scores[rel] = score
+    scores = {rel: score for rel, score in scan_keywords(text).rel.items() if score > 0}
 
     if not scores:
         return None
@@ -274,7 +816,357 @@ def detect_relationship(text: str) -> str | None:
 
 def random_delay(lo: float, hi: float):
     """Sleep for a random duration between lo and hi seconds."""
-    time.sleep(random.uniform(lo, hi))
+    seconds = random.uniform(lo, hi)
+    time.sleep(seconds)
+    METRICS.observe("sleep", seconds)
+
+
+# ---------------------------------------------------------------------------
+# Batch text features (NumPy)
+# ---------------------------------------------------------------------------
+
+
+class TextFeatures(NamedTuple):
+    """Per-text features of a batch; row i belongs to texts[i]."""
+    chinese_chars: "np.ndarray"  # int64 (n,): count_chinese_chars
+    length: "np.ndarray"         # int8 (n,): index into LENGTH_RANGES, -1 in the gap zone
+    blessing: "np.ndarray"       # int32 (n,): KeywordHits.blessing
+    style: "np.ndarray"          # int32 (n, len(KEYWORD_MATCHER.styles))
+    rel: "np.ndarray"            # int32 (n, len(KEYWORD_MATCHER.rels))
+
+
+class BatchKeywordMatcher:
+    """KeywordMatcher scores for many texts at once, on code point arrays.
+
+    Every character used by some keyword gets a small id (0 for all other
+    characters, including the NUL between texts). The ids of the max_len
+    characters starting at each position are packed into one uint64 window,
+    so keyword k of length L is present at a position exactly when the low
+    L fields of its window equal k's packed ids: one sorted lookup per
+    keyword length, whatever the number of keywords. Presence of keyword k
+    in text i goes into a hit matrix, and hits @ weights gives the same
+    presence-based slot scores as KeywordMatcher.scan.
+    """
+
+    def __init__(self, matcher: KeywordMatcher):
+        self.styles = matcher.styles
+        self.rels = matcher.rels
+        self.keywords = list(matcher._slots)
+        self.weights = np.zeros((len(self.keywords), matcher._n_slots), dtype=np.int32)
+        for k, kw in enumerate(self.keywords):
+            for slot in matcher._slots[kw]:
+                self.weights[k, slot] += 1
+        self.max_len = max(len(kw) for kw in self.keywords)
+        alphabet = {ch: i for i, ch in enumerate(sorted(set("".join(self.keywords))), 1)}
+        self.bits = len(alphabet).bit_length()
+        if self.bits * self.max_len > 64:
+            raise ValueError("keywords too long or too varied to pack into 64-bit windows")
+        self.lut_size = max(map(ord, alphabet)) + 1
+        self.char_ids = np.zeros(self.lut_size, dtype=np.uint64)
+        self.char_ids[[ord(ch) for ch in alphabet]] = list(alphabet.values())
+        self.first_chars = np.zeros(len(alphabet) + 1, dtype=bool)
+        # Keyword length -> (sorted packed ids, keyword index of each)
+        self.by_length: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        packed: dict[int, list[tuple[int, int]]] = {}
+        for k, kw in enumerate(self.keywords):
+            self.first_chars[alphabet[kw[0]]] = True
+            value = sum(alphabet[ch] << (self.bits * j) for j, ch in enumerate(kw))
+            packed.setdefault(len(kw), []).append((value, k))
+        for length, items in packed.items():
+            items.sort()
+            self.by_length[length] = (np.array([v for v, _ in items], dtype=np.uint64),
+                                      np.array([k for _, k in items], dtype=np.int64))
+
+    def hits(self, codes: "np.ndarray", starts: "np.ndarray", n: int) -> "np.ndarray":
+        """(n, len(keywords)) presence matrix for texts at starts in codes.
+
+        codes must end with max_len - 1 separator (0) code points, so windows
+        can be read past the last text without bounds checks.
+        """
+        hits = np.zeros((n, len(self.keywords)), dtype=bool)
+        ids = np.zeros(len(codes), dtype=np.uint64)
+        in_table = codes < self.lut_size
+        ids[in_table] = self.char_ids[codes[in_table]]
+        positions = np.flatnonzero(self.first_chars[ids.astype(np.intp)])
+        if not len(positions):
+            return hits
+        windows = ids[positions]
+        for j in range(1, self.max_len):
+            windows |= ids[positions + j] << np.uint64(self.bits * j)
+        rows = np.searchsorted(starts, positions, side="right") - 1
+        for length, (values, keyword) in self.by_length.items():
+            masked = windows & np.uint64((1 << (self.bits * length)) - 1)
+            slot = np.minimum(np.searchsorted(values, masked), len(values) - 1)
+            found = values[slot] == masked
+            hits[rows[found], keyword[slot[found]]] = True
+        return hits
+
+
+@lru_cache(maxsize=1)
+def _batch_matcher() -> BatchKeywordMatcher:
+    return BatchKeywordMatcher(KEYWORD_MATCHER)
+
+
+def _code_points(texts: list[str], pad: int) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """texts joined by NUL as a uint32 array (plus pad NULs), with each text's start and end."""
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    starts = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    joined = "\0".join(texts) + "\0" * pad
+    codes = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    return codes, starts, starts + lengths
+
+
+def classify_length_batch(chinese_chars: "np.ndarray") -> "np.ndarray":
+    """classify_length for an array of counts, as indexes into LENGTH_RANGES (-1: gap zone)."""
+    codes = np.full(len(chinese_chars), -1, dtype=np.int8)
+    # Reversed, so the first range containing a count wins, as in classify_length
+    for i, (lo, hi) in reversed(list(enumerate(LENGTH_RANGES.values()))):
+        codes[(chinese_chars >= lo) & (chinese_chars <= hi)] = i
+    return codes
+
+
+def text_features(texts: list[str]) -> TextFeatures:
+    """Chinese character counts, length buckets and keyword scores of a batch of texts."""
+    matcher = _batch_matcher()
+    # A new chunk starts at each text whose end crosses a multiple of BATCH_CHUNK_CHARS
+    offsets = np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)) + 1)
+    bounds = np.flatnonzero(np.diff(offsets // BATCH_CHUNK_CHARS, prepend=0))
+    bounds = bounds[bounds > 0].tolist()
+    chunks = []
+    for begin, end in zip([0, *bounds], [*bounds, len(texts)]):
+        chunk = texts[begin:end]
+        codes, starts, ends = _code_points(chunk, matcher.max_len)
+        cjk = np.concatenate(([0], np.cumsum((codes >= 0x4E00) & (codes <= 0x9FFF))))
+        chunks.append((cjk[ends] - cjk[starts],
+                       matcher.hits(codes, starts, len(chunk)).astype(np.int32) @ matcher.weights))
+    chinese_chars = np.concatenate([cc for cc, _ in chunks])
+    scores = np.concatenate([sc for _, sc in chunks])
+    n_styles = len(matcher.styles)
+    return TextFeatures(chinese_chars, classify_length_batch(chinese_chars), scores[:, 0],
+                        scores[:, 1:1 + n_styles], scores[:, 1 + n_styles:])
+
+
+def noise_batch(texts: list[str]) -> "np.ndarray":
+    """has_noise for a batch: each NoiseFilter alternation runs once over the joined texts.
+
+    Texts are joined by newlines, which no noise rule can match across.
+    """
+    noisy = np.zeros(len(texts), dtype=bool)
+    for pattern, fold in ((NOISE_FILTER._sensitive, False), (NOISE_FILTER._folded, True)):
+        if pattern is None or not texts:
+            continue
+        parts = [text.casefold() for text in texts] if fold else texts
+        lengths = np.fromiter(map(len, parts), dtype=np.int64, count=len(parts))
+        starts = np.zeros(len(parts), dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=starts[1:])
+        found = [m.start() for m in pattern.finditer("\n".join(parts))]
+        if found:
+            noisy[np.searchsorted(starts, found, side="right") - 1] = True
+    return noisy
+
+
+def filter_blessing_batch(texts: list[str], features: TextFeatures | None = None) -> list[bool]:
+    """filter_blessing for every text; noise is only checked where the cheap tests pass."""
+    if np is None:
+        return [filter_blessing(text) for text in texts]
+    features = features or text_features(texts)
+    cc = features.chinese_chars
+    keep = (cc >= 6) & (cc <= 700) & (features.blessing >= 2)
+    candidates = np.flatnonzero(keep)
+    if len(candidates):
+        keep[candidates[noise_batch([texts[i] for i in candidates])]] = False
+    return keep.tolist()
+
+
+def _argmax_labels(scores: "np.ndarray", labels: list[str]) -> "np.ndarray":
+    """Label of each row's first highest score (as max() over a dict), None if all are 0."""
+    out = np.full(len(scores), None, dtype=object)
+    if scores.shape[1]:
+        best = scores.argmax(axis=1)
+        hit = scores[np.arange(len(scores)), best] > 0
+        out[hit] = np.array(labels, dtype=object)[best[hit]]
+    return out
+
+
+def detect_style_batch(texts: list[str], features: TextFeatures | None = None) -> list[str | None]:
+    """detect_style for every text."""
+    if np is None:
+        return [detect_style(text) for text in texts]
+    features = features or text_features(texts)
+    styles = _argmax_labels(features.style, _batch_matcher().styles)
+    styles[features.chinese_chars <= 36] = "brief"
+    return styles.tolist()
+
+
+def detect_relationship_batch(texts: list[str], features: TextFeatures | None = None) -> list[str | None]:
+    """detect_relationship for every text."""
+    if np is None:
+        return [detect_relationship(text) for text in texts]
+    features = features or text_features(texts)
+    return _argmax_labels(features.rel, _batch_matcher().rels).tolist()
+
+
+# ---------------------------------------------------------------------------
+# Run instrumentation (per-stage latency, per-host and per-query stats)
+# ---------------------------------------------------------------------------
+
+
+class LatencyHistogram:
+    """Durations of one stage: count, total, max and power-of-two microsecond buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: dict[int, int] = {}  # upper bound in us -> count
+
+    def add(self, seconds: float, n: int = 1):
+        """Record n durations of the given length (n > 1: a batch's per-item share)."""
+        self.count += n
+        self.total += seconds * n
+        self.max = max(self.max, seconds)
+        bound, us = 1, seconds * 1e6
+        while bound < us:
+            bound *= 2
+        self.buckets[bound] = self.buckets.get(bound, 0) + n
+
+    def percentile(self, q: float) -> float:
+        """Upper bucket bound (ms) below which a fraction q of durations fall."""
+        seen = 0
+        for bound in sorted(self.buckets):
+            seen += self.buckets[bound]
+            if seen >= q * self.count:
+                return bound / 1000
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets_us": {str(bound): n for bound, n in sorted(self.buckets.items())},
+        }
+
+    def merge(self, data: dict):
+        """Add the durations of another histogram's to_dict() output."""
+        self.count += data["count"]
+        self.total += data["total_s"]
+        self.max = max(self.max, data["max_ms"] / 1000)
+        for bound, n in data["buckets_us"].items():
+            self.buckets[int(bound)] = self.buckets.get(int(bound), 0) + n
+
+
+class ScrapeMetrics:
+    """Where a run's time goes: stage histograms, counters, per-host and per-query stats.
+
+    Stages: fetch, search, resolve (Sogou redirects), decode, extract
+    (parse + candidate walk, interleaved in the streaming extractor),
+    filter, classify, dedup, save, sleep (politeness delays) and backoff
+    (search governor waits). Thread-safe; extraction processes send their
+    stage histograms back with each result (export_stages / merge_stages).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages: dict[str, LatencyHistogram] = {}
+            self.counters: dict[str, int] = {}
+            self.hosts: dict[str, dict] = {}
+            self.queries: dict[str, dict] = {}
+            self._url_query: dict[str, str] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def observe(self, name: str, seconds: float, n: int = 1):
+        with self._lock:
+            hist = self.stages.get(name)
+            if hist is None:
+                hist = self.stages[name] = LatencyHistogram()
+            hist.add(seconds, n)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def host(self, host: str, seconds: float, nbytes: int, ok: bool):
+        with self._lock:
+            stats = self.hosts.setdefault(host, {"requests": 0, "failures": 0, "seconds": 0.0, "bytes": 0})
+            stats["requests"] += 1
+            stats["failures"] += not ok
+            stats["seconds"] += seconds
+            stats["bytes"] += nbytes
+
+    def query(self, engine: str, query: str, requests: int, urls: list[str]):
+        """Count a query's search requests and remember which query found each URL."""
+        key = f"{engine}:{query}"
+        with self._lock:
+            stats = self.queries.setdefault(key, {"engine": engine, "query": query, "searches": 0,
+                                                  "urls": 0, "pages": 0, "accepted": 0})
+            stats["searches"] += requests
+            stats["urls"] += len(urls)
+            for url in urls:
+                self._url_query.setdefault(url, key)
+
+    def alias(self, urls: list[str], resolved: list[str | None]):
+        """Let each resolved article URL credit the query that found its search result."""
+        with self._lock:
+            for url, article in zip(urls, resolved):
+                key = self._url_query.get(url)
+                if key is not None and article is not None:
+                    self._url_query.setdefault(article, key)
+
+    def page(self, url: str, accepted: int):
+        """Credit a crawled page's accepted blessings to the query that found it."""
+        with self._lock:
+            key = self._url_query.get(url)
+            if key is not None:
+                self.queries[key]["pages"] += 1
+                self.queries[key]["accepted"] += accepted
+
+    def export_stages(self, reset: bool = False) -> dict[str, dict]:
+        with self._lock:
+            stages = {name: hist.to_dict() for name, hist in self.stages.items()}
+            if reset:
+                self.stages = {}
+        return stages
+
+    def merge_stages(self, stages: dict[str, dict]):
+        with self._lock:
+            for name, data in stages.items():
+                self.stages.setdefault(name, LatencyHistogram()).merge(data)
+
+    def report(self) -> dict:
+        with self._lock:
+            hosts = {host: dict(stats, seconds=round(stats["seconds"], 3))
+                     for host, stats in sorted(self.hosts.items(), key=lambda kv: -kv[1]["requests"])}
+            queries = sorted(self.queries.values(), key=lambda q: (-q["accepted"], -q["searches"]))
+            return {
+                "started_at": datetime.fromtimestamp(self.started).isoformat(),
+                "elapsed_s": round(time.time() - self.started, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "stages": {name: hist.to_dict() for name, hist in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "hosts": hosts,
+                "queries": [dict(q) for q in queries],
+            }
+
+
+# Module-level so that fetch helpers and extraction workers can record into it
+METRICS = ScrapeMetrics()
 
 
 # ---------------------------------------------------------------------------
@@ -282,77 +1174,249 @@ def random_delay(lo: float, hi: float):
 # ---------------------------------------------------------------------------
 
 
-def create_session() -> requests.Session:
-    """Create a requests session with default headers."""
+def create_session(pool_size: int = 1, retries: int = HTTP_RETRIES,
+                   backoff: float = HTTP_RETRY_BACKOFF) -> requests.Session:
+    """Create a requests session with default headers and a tuned transport.
+
+    pool_size is the number of threads that will share the session; each
+    host's keep-alive pool is made at least that deep so concurrent fetches
+    reuse connections instead of opening and discarding extra ones.
+    """
     session = requests.Session()
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=backoff, status_forcelist=HTTP_RETRY_STATUSES,
+                  allowed_methods=frozenset(["GET", "HEAD"]),
+                  respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS,
+                          pool_maxsize=max(pool_size, HTTP_POOL_MIN_SIZE),
+                          max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
     session.headers.update({
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-        "Accept-Encoding": "gzip, deflate",
+        "Accept-Encoding": "gzip, deflate, br" if brotli is not None else "gzip, deflate",
         "Connection": "keep-alive",
     })
     return session
 
 
-def rotate_ua(session: requests.Session):
-    """Rotate User-Agent on the session."""
-    session.headers["User-Agent"] = random.choice(USER_AGENTS)
-
+def rotate_ua() -> dict[str, str]:
+    """Pick a random User-Agent for a single request.
 
-def fetch_page(session: requests.Session, url: str, timeout: int = 15) -> str | None:
-    """Fetch a page with encoding fallback. Returns HTML string or None."""
-    rotate_ua(session)
+    Returned as per-request headers instead of mutating session.headers, so
+    one session can be shared safely by concurrent fetch threads.
+    """
+    return {"User-Agent": random.choice(USER_AGENTS)}
+
+
+def fetch_page(session: requests.Session, url: str, timeout: int = 15,
+               throttle: "HostThrottle | None" = None,
+               cache: "ResponseCache | None" = None,
+               max_bytes: int = PAGE_MAX_BYTES,
+               stats: "TransferStats | None" = None,
+               stage: str = "fetch",
+               redirects: "RedirectCache | None" = None) -> str | None:
+    """Fetch a page with encoding fallback. Returns HTML string or None.
+
+    If throttle is given, every request (including the Sogou redirect
+    resolution, skipped when redirects already knows the link) first waits
+    for its host's politeness slot. If cache is
+    given, fresh entries are served from disk, stale ones are revalidated
+    with a conditional GET, and in offline mode nothing touches the network.
+    The body is streamed and cut at max_bytes or the end of the article
+    (see read_html_body); non-HTML responses are skipped unread. Network
+    time is recorded under the given METRICS stage and the page's host.
+    """
+    headers = rotate_ua()
 
     # Resolve Sogou WeChat redirect links to actual mp.weixin.qq.com URLs
-    if "weixin.sogou.com/link" in url:
-        url = _resolve_sogou_redirect(session, url)
+    if is_sogou_link(url):
+        url = resolve_article_url(session, url, headers=headers, throttle=throttle,
+                                  redirects=redirects,
+                                  offline=cache is not None and cache.offline)
         if url is None:
             return None
 
-    try:
-        resp = session.get(url, timeout=timeout, allow_redirects=True)
-        resp.raise_for_status()
+    entry = None
+    if cache is not None:
+        entry = cache.get(url)
+        if entry is not None and (cache.offline or cache.is_fresh(entry)):
+            METRICS.count("cache_hits")
+            return cache.read_body(entry)
+        if cache.offline:
+            return None
+        headers.update(cache.conditional_headers(entry))
 
-        # Encoding fallback chain: declared > apparent > gbk > gb2312
-        if resp.encoding and resp.encoding.lower() not in ("iso-8859-1",):
-            text = resp.text
-        else:
-            if resp.apparent_encoding:
-                resp.encoding = resp.apparent_encoding
-                text = resp.text
-            else:
-                for enc in ("utf-8", "gbk", "gb2312", "gb18030"):
-                    try:
-                        text = resp.content.decode(enc)
-                        break
-                    except (UnicodeDecodeError, LookupError):
-                        continue
-                else:
-                    text = resp.content.decode("utf-8", errors="replace")
+    if throttle is not None:
+        throttle.wait(url)
+    started = time.perf_counter()
+    wire = 0
+    try:
+        with session.get(url, timeout=timeout, allow_redirects=True, headers=headers,
+                         stream=True) as resp:
+            if resp.status_code == 304 and entry is not None:
+                cache.revalidated(url, entry)
+                METRICS.count("revalidated")
+                return cache.read_body(entry)
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if content_type and not content_type.lower().startswith(HTML_CONTENT_TYPES):
+                print(f"  [SKIP] Not HTML ({content_type.split(';')[0]}): {url}")
+                if stats is not None:
+                    stats.record_skipped()
+                return None
+            content, cut = read_html_body(resp, max_bytes)
+            wire = resp.raw.tell()
+            if stats is not None:
+                stats.record(len(content), wire, cut)
+        METRICS.host(url_host(url), time.perf_counter() - started, wire, ok=True)
+
+        with METRICS.stage("decode"):
+            text = ENCODINGS.decode(content, resp.encoding, urlsplit(resp.url).hostname)
+        if cache is not None:
+            cache.put(url, text, etag=resp.headers.get("ETag"),
+                      last_modified=resp.headers.get("Last-Modified"))
         return text
     except requests.RequestException as e:
         print(f"  [WARN] Failed to fetch {url}: {e}")
+        METRICS.host(url_host(url), time.perf_counter() - started, wire, ok=False)
+        return None
+    finally:
+        METRICS.observe(stage, time.perf_counter() - started)
+
+
+def read_html_body(resp: requests.Response, max_bytes: int = PAGE_MAX_BYTES) -> tuple[bytes, str | None]:
+    """Read a streamed response body, stopping early where possible.
+
+    Returns (body, cut) where cut is None if the whole body was read, "end"
+    if reading stopped at the end of the article, or "cap" at max_bytes.
+    """
+    body = bytearray()
+    for chunk in resp.iter_content(chunk_size=PAGE_CHUNK_SIZE):
+        start = max(0, len(body) - ARTICLE_END_OVERLAP)
+        body += chunk
+        end = _article_end(body, start)
+        if end is not None:
+            cut = "end" if body[end:].strip().lower() not in (b"", b"</html>") else None
+            del body[end:]
+            return bytes(body), cut
+        if len(body) >= max_bytes:
+            del body[max_bytes:]
+            return bytes(body), "cap"
+    return bytes(body), None
+
+
+def _article_end(body: bytearray, start: int) -> int | None:
+    """Offset after which body holds no article text, searching from start.
+
+    WeChat's toolbar/QR-code blocks only count once js_content has been seen,
+    so pages that merely share the class names are not cut too early.
+    """
+    for match in ARTICLE_END_RE.finditer(body, start):
+        if match.group(0).startswith(b"</"):
+            return match.end()
+        if body.find(b"js_content", 0, match.start()) >= 0:
+            return match.start()
+    return None
+
+
+class TransferStats:
+    """Bytes transferred per fetched page, shared by the fetch threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.max_body_bytes = 0
+        self.cuts = {"end": 0, "cap": 0}
+        self.skipped = 0
+
+    def record(self, body_bytes: int, wire_bytes: int, cut: str | None):
+        with self._lock:
+            self.pages += 1
+            self.wire_bytes += wire_bytes
+            self.body_bytes += body_bytes
+            self.max_body_bytes = max(self.max_body_bytes, body_bytes)
+            if cut is not None:
+                self.cuts[cut] += 1
+
+    def record_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"pages": self.pages, "wire_bytes": self.wire_bytes, "body_bytes": self.body_bytes,
+                    "max_body_bytes": self.max_body_bytes, "cuts": dict(self.cuts),
+                    "skipped": self.skipped}
+
+    def summary(self) -> str:
+        avg = self.wire_bytes / self.pages / 1024 if self.pages else 0.0
+        line = (f"{self.pages} pages, {self.wire_bytes / 1024:.0f} KB on the wire "
+                f"({avg:.1f} KB/page), largest body {self.max_body_bytes / 1024:.0f} KB; "
+                f"{self.cuts['end']} cut after the article, {self.cuts['cap']} at the size cap, "
+                f"{self.skipped} non-HTML skipped")
+        peak = peak_rss_mb()
+        if peak is not None:
+            line += f"; peak RSS {peak:.0f} MB"
+        return line
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
         return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
 
+def is_sogou_link(url: str) -> bool:
+    """Whether url is a Sogou WeChat result redirect (/link?url=...)."""
+    return "weixin.sogou.com/link" in url or url.startswith(f"{WEIXIN_SEARCH_BASE}/link?")
 
-def _resolve_sogou_redirect(session: requests.Session, redirect_url: str) -> str | None:
+
+def _resolve_sogou_redirect(session: requests.Session, redirect_url: str,
+                            headers: dict[str, str] | None = None,
+                            throttle: "HostThrottle | None" = None) -> str | None:
     """Resolve a Sogou WeChat redirect link to the actual mp.weixin.qq.com URL.
     Sogou fragments the URL in JS like: url += 'https://mp.'; url += 'weixin.qq.c'; ...
+
+    The body is streamed and reading stops as soon as the run of fragments
+    is followed by other code, so the rest of the page is never downloaded.
     """
     try:
-        resp = session.get(redirect_url, timeout=10, allow_redirects=True)
-        if resp.status_code != 200:
-            return None
+        if throttle is not None:
+            throttle.wait(redirect_url)
+        with METRICS.stage("resolve"), \
+                session.get(redirect_url, timeout=10, allow_redirects=True, stream=True,
+                            headers=headers or rotate_ua()) as resp:
+            if resp.status_code != 200:
+                return None
+            # Incremental, so a character split across chunks is not lost
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+            text = ""
+            scan_from = 0
+            size = 0
+            for chunk in resp.iter_content(chunk_size=REDIRECT_CHUNK_SIZE):
+                size += len(chunk)
+                text += decoder.decode(chunk)
+                complete, scan_from = _sogou_fragments_complete(text, scan_from)
+                if complete or size >= REDIRECT_MAX_BYTES:
+                    break
+            text += decoder.decode(b"", final=True)
 
         # Extract fragmented URL from JS: url += '...'; url += '...';
-        fragments = re.findall(r"url\s*\+=\s*'([^']*)'", resp.text)
+        fragments = SOGOU_URL_FRAGMENT_RE.findall(text)
         if fragments:
             actual_url = "".join(fragments)
             if actual_url.startswith("http"):
                 return actual_url
 
         # Fallback: look for direct mp.weixin URL in content
-        match = re.search(r'(https?://mp\.weixin\.qq\.com/s[^\s"\'<>]+)', resp.text)
+        match = WEIXIN_ARTICLE_URL_RE.search(text)
         if match:
             return match.group(1)
 
@@ -361,75 +1425,799 @@ def _resolve_sogou_redirect(session: requests.Session, redirect_url: str) -> str
         return None
 
 
+def _sogou_fragments_complete(text: str, start: int = 0) -> tuple[bool, int]:
+    """Whether the `url += '...'` run in a partially read page has ended.
+
+    True once the last fragment is followed by something that is neither
+    another `url +=` nor a prefix of one cut off at the chunk boundary.
+    Only text[start:] is scanned; the second value is where the next call
+    should start (the last fragment found, or the overlap window before any),
+    so each character is scanned about once as the page grows.
+    """
+    last = None
+    for last in SOGOU_URL_FRAGMENT_RE.finditer(text, start):
+        pass
+    if last is None:
+        return False, max(start, len(text) - REDIRECT_SCAN_OVERLAP)
+    return not SOGOU_URL_FRAGMENT_NEXT_RE.match(text, last.end()), last.start()
+
+
 # ---------------------------------------------------------------------------
-# Search (WeChat/Sogou-based for public account articles)
+# Article identity (canonical URLs + persistent Sogou redirect cache)
 # ---------------------------------------------------------------------------
 
 
-def weixin_sogou_search_urls(session: requests.Session, query: str, pages: int = 3) -> list[str]:
-    """Search WeChat articles via Sogou WeChat search. Returns article URLs."""
-    urls = []
-    for page in range(1, pages + 1):
-        search_url = (
-            f"https://weixin.sogou.com/weixin?"
-            f"type=2&query={quote(query)}&page={page}"
-        )
+def canonical_article_url(url: str) -> str:
+    """Stable URL for a page, so share and tracking variants compare equal.
+
+    A WeChat article URL (/s?__biz=...) keeps only __biz, mid, idx and sn,
+    in that order; short /s/<id> links and other pages just lose their
+    fragment and utm_* parameters.
+    """
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    host = parts.netloc.lower()
+    found = dict(params)
+    if parts.path == "/s" and all(found.get(name) for name in WEIXIN_ARTICLE_PARAMS):
+        query = urlencode([(name, found[name]) for name in WEIXIN_ARTICLE_PARAMS], safe="=")
+        scheme = "https" if host == "mp.weixin.qq.com" else parts.scheme
+        return urlunsplit((scheme, host, parts.path, query, ""))
+    # Other URLs are sent as found, so edit the raw query rather than re-encode it
+    query = "&".join(pair for pair in parts.query.split("&")
+                     if not unquote_plus(pair.partition("=")[0]).startswith(TRACKING_PARAM_PREFIXES))
+    return urlunsplit((parts.scheme, host, parts.path, query, ""))
+
+
+def sogou_link_key(url: str) -> str:
+    """Redirect cache key of a Sogou /link URL: its url= token, if it has one."""
+    for name, value in parse_qsl(urlsplit(url).query):
+        if name == "url":
+            return value
+    return url
+
+
+class RedirectCache:
+    """Sogou link token -> canonical article URL, kept across runs.
+
+    Shared by the fetch threads. Only successful resolutions are stored;
+    entries older than ttl are dropped on load. path=None keeps it in memory.
+    """
+
+    def __init__(self, path: Path | None = REDIRECT_CACHE_FILE, ttl: float = REDIRECT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print(f"  [WARN] Ignoring unreadable redirect cache {path}")
+        now = time.time()
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if now - entry["resolved_at"] <= ttl}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, link: str) -> str | None:
+        with self._lock:
+            entry = self.entries.get(sogou_link_key(link))
+        return None if entry is None else entry["url"]
+
+    def put(self, link: str, article_url: str):
+        with self._lock:
+            self.entries[sogou_link_key(link)] = {"url": article_url, "resolved_at": time.time()}
+            self._dirty = True
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self.entries)
+            self._dirty = False
+        atomic_write_json(self.path, entries)
+
+
+def resolve_article_url(session: requests.Session, url: str,
+                        headers: dict[str, str] | None = None,
+                        throttle: "HostThrottle | None" = None,
+                        redirects: RedirectCache | None = None,
+                        offline: bool = False) -> str | None:
+    """Canonical article URL of a search result, or None for an unresolvable Sogou link.
+
+    Sogou links found in redirects cost no request; the others are resolved
+    (never in offline mode) and remembered.
+    """
+    if not is_sogou_link(url):
+        return canonical_article_url(url)
+    if redirects is not None:
+        article = redirects.get(url)
+        if article is not None:
+            METRICS.count("redirect_cache_hits")
+            return article
+    if offline:
+        return None
+    article = _resolve_sogou_redirect(session, url, headers=headers, throttle=throttle)
+    if article is None:
+        return None
+    article = canonical_article_url(article)
+    if redirects is not None:
+        redirects.put(url, article)
+    return article
+
+
+# ---------------------------------------------------------------------------
+# Response decoding
+# ---------------------------------------------------------------------------
+
+
+def normalize_encoding(label: str | bytes | None) -> str | None:
+    """Canonical Python codec name for a charset label, or None if unknown."""
+    if not label:
+        return None
+    if isinstance(label, bytes):
+        label = label.decode("ascii", errors="ignore")
+    label = label.strip().lower()
+    label = ENCODING_ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
 
-        # Retry up to 3 times with increasing backoff
-        html = None
-        for attempt in range(3):
-            html = fetch_page(session, search_url)
-            if html is None:
+def sniff_encoding(content: bytes) -> str | None:
+    """Encoding from a BOM or <meta charset>/XML declaration near the top of the page."""
+    if content.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    match = META_CHARSET_RE.search(content, 0, ENCODING_SNIFF_BYTES)
+    if match:
+        return normalize_encoding(match.group(1) or match.group(2))
+    return None
+
+
+class EncodingResolver:
+    """Decode response bodies, remembering the encoding each host turned out to use.
+
+    Resolution order: Content-Type charset (ISO-8859-1 is requests' default
+    for text/* and treated as undeclared) > BOM / <meta charset> > strict
+    UTF-8 > the host's last encoding if the body decodes strictly with it >
+    statistical detection over a prefix of the body. UTF-8 is tried first
+    because GBK happily "decodes" most UTF-8 byte strings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: dict[str, str] = {}
+
+    def host_encoding(self, host: str | None) -> str | None:
+        with self._lock:
+            return self._hosts.get(host)
+
+    def _learn(self, host: str | None, encoding: str):
+        if host:
+            with self._lock:
+                self._hosts[host] = encoding
+
+    def decode(self, content: bytes, declared: str | None = None,
+               host: str | None = None) -> str:
+        if declared and declared.lower() != "iso-8859-1":
+            encoding = normalize_encoding(declared)
+            if encoding is not None:
+                return content.decode(encoding, errors="replace")
+
+        encoding = sniff_encoding(content)
+        if encoding is not None:
+            self._learn(host, encoding)
+            return content.decode(encoding, errors="replace")
+
+        for encoding in ("utf-8", self.host_encoding(host)):
+            if encoding is None:
+                continue
+            try:
+                # final=False: a multi-byte character cut off at the size cap is dropped
+                text = codecs.getincrementaldecoder(encoding)().decode(content, final=False)
+            except UnicodeDecodeError:
+                continue
+            self._learn(host, encoding)
+            return text
+
+        encoding = self.detect(content)
+        self._learn(host, encoding)
+        return content.decode(encoding, errors="replace")
+
+    @staticmethod
+    def detect(content: bytes) -> str:
+        """Statistical detection on the first ENCODING_DETECT_BYTES (GB18030 if inconclusive)."""
+        guess = requests.compat.chardet.detect(content[:ENCODING_DETECT_BYTES])["encoding"]
+        return normalize_encoding(guess) or "gb18030"
+
+
+# Shared by every fetch thread; the per-host memory is lock-protected
+ENCODINGS = EncodingResolver()
+
+
+# ---------------------------------------------------------------------------
+# On-disk HTTP response cache
+# ---------------------------------------------------------------------------
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of decoded page bodies.
+
+    Layout under root:
+        entries/<xx>/<sha1(url)>.json   url, ETag, Last-Modified, fetched_at, body hash
+        bodies/<xx>/<sha256(body)>.gz   gzip'd decoded text, shared by identical pages
+
+    Entries are keyed by the final page URL (after Sogou redirect resolution).
+    The entry file's mtime doubles as its last-access time for LRU eviction
+    once the bodies exceed max_bytes.
+    """
+
+    def __init__(self, root: Path = HTTP_CACHE_DIR, ttl: float = HTTP_CACHE_TTL,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES, offline: bool = False):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    def _entry_path(self, url: str) -> Path:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.root / "entries" / key[:2] / f"{key}.json"
+
+    def _body_path(self, body_hash: str) -> Path:
+        return self.root / "bodies" / body_hash[:2] / f"{body_hash}.gz"
+
+    def get(self, url: str) -> dict | None:
+        """Cached entry for url (metadata only), or None."""
+        path = self._entry_path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._body_path(entry["body_hash"]).exists():
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def will_serve(self, url: str) -> bool:
+        """True if fetch_page would answer url from disk without any request."""
+        entry = self.get(url)
+        return entry is not None and (self.offline or self.is_fresh(entry))
+
+    def read_body(self, entry: dict) -> str:
+        with gzip.open(self._body_path(entry["body_hash"]), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def conditional_headers(entry: dict | None) -> dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for revalidating entry."""
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, url: str, entry: dict):
+        """Record a 304 Not Modified: the cached body is fresh again."""
+        entry["fetched_at"] = time.time()
+        self._write_entry(url, entry)
+
+    def put(self, url: str, body: str, etag: str | None = None,
+            last_modified: str | None = None):
+        data = body.encode("utf-8")
+        body_hash = hashlib.sha256(data).hexdigest()
+        body_path = self._body_path(body_hash)
+        added = 0
+        if not body_path.exists():
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = body_path.with_name(f"{body_path.name}.{threading.get_ident()}.tmp")
+            with gzip.open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, body_path)
+            added = body_path.stat().st_size
+
+        self._write_entry(url, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "body_hash": body_hash,
+        })
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_body_bytes()
+            else:
+                self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._total_bytes = self._evict()
+
+    def _write_entry(self, url: str, entry: dict):
+        path = self._entry_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _scan_body_bytes(self) -> int:
+        return sum(p.stat().st_size for p in (self.root / "bodies").glob("*/*.gz"))
+
+    def _evict(self) -> int:
+        """Drop least recently used entries (and orphaned bodies) down to 90% of max_bytes."""
+        entries = []
+        refs: dict[str, int] = {}
+        for path in (self.root / "entries").glob("*/*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    body_hash = json.load(f)["body_hash"]
+                entries.append((path.stat().st_mtime, path, body_hash))
+            except (OSError, ValueError, KeyError):
+                continue
+            refs[body_hash] = refs.get(body_hash, 0) + 1
+
+        total = self._scan_body_bytes()
+        entries.sort(key=lambda e: e[0])
+        for _, path, body_hash in entries:
+            if total <= self.max_bytes * 0.9:
                 break
-            if "用户您好，您的访问过于频繁" in html or "antispider" in html:
-                backoff = random.uniform(120, 300) * (attempt + 1)
-                print(f"  [BLOCKED] Sogou anti-bot (attempt {attempt+1}/3), waiting {backoff:.0f}s...")
+            path.unlink(missing_ok=True)
+            refs[body_hash] -= 1
+            if refs[body_hash] == 0:
+                body_path = self._body_path(body_hash)
+                try:
+                    total -= body_path.stat().st_size
+                    body_path.unlink()
+                except OSError:
+                    pass
+        return total
+
+
+# ---------------------------------------------------------------------------
+# Concurrent fetching with per-host politeness
+# ---------------------------------------------------------------------------
+
+
+def url_host(url: str) -> str:
+    """Lower-cased host name of a URL ("" if it has none)."""
+    return (urlsplit(url).hostname or "").lower()
+
+
+class HostThrottle:
+    """Per-host token bucket with a capacity of one request.
+
+    Each host hands out one slot every random.uniform(lo, hi) seconds, which
+    is the same spacing the sequential crawler gets from random_delay().
+    Requests to different hosts never wait on each other.
+    """
+
+    def __init__(self, lo: float, hi: float):
+        self.lo = lo
+        self.hi = hi
+        self._lock = threading.Lock()
+        self._next_slot: dict[str, float] = {}
+
+    def wait(self, url: str):
+        """Block until url's host may be requested again, then book the next slot."""
+        host = url_host(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + random.uniform(self.lo, self.hi)
+        if slot > now:
+            time.sleep(slot - now)
+            METRICS.observe("sleep", slot - now)
+
+
+class PageFetcher:
+    """Fetch batches of pages, sequentially or on a thread pool.
+
+    Results are always yielded in input order on the caller's thread, so
+    everything downstream (extraction, classification, _add_blessing) runs
+    single-threaded and produces the same buckets regardless of worker count.
+    """
+
+    def __init__(self, session: requests.Session, workers: int = 1,
+                 delay: tuple[float, float] = PAGE_DELAY,
+                 cache: ResponseCache | None = None,
+                 max_bytes: int = PAGE_MAX_BYTES,
+                 redirects: RedirectCache | None = None):
+        self.session = session
+        self.cache = cache
+        self.redirects = redirects if redirects is not None else RedirectCache(path=None)
+        self.max_bytes = max_bytes
+        self.stats = TransferStats()
+        self.workers = max(1, workers)
+        self.delay = delay
+        self.throttle = HostThrottle(*delay)
+        self._pool = (ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fetch")
+                      if self.workers > 1 else None)
+
+    def fetch(self, url: str) -> str | None:
+        """Fetch a single page, honouring the per-host throttle in concurrent mode."""
+        throttle = self.throttle if self._pool is not None else None
+        return fetch_page(self.session, url, throttle=throttle, cache=self.cache,
+                          max_bytes=self.max_bytes, stats=self.stats, redirects=self.redirects)
+
+    def resolve(self, url: str) -> str | None:
+        """Canonical article URL for url (see resolve_article_url)."""
+        return resolve_article_url(self.session, url, throttle=self.throttle,
+                                   redirects=self.redirects,
+                                   offline=self.cache is not None and self.cache.offline)
+
+    def resolve_many(self, urls: list[str]) -> list[str | None]:
+        """resolve() each url, in input order.
+
+        Sogou links the redirect cache does not know are requested on the
+        pool (or in turn), always spaced by the per-host throttle.
+        """
+        if self._pool is None:
+            return [self.resolve(url) for url in urls]
+        return list(self._pool.map(self.resolve, urls))
+
+    def fetch_many(self, urls, delay: tuple[float, float] | None = None):
+        """Yield (url, html) pairs in input order.
+
+        Sequential mode sleeps random_delay(*delay) after each page that hit
+        the network, as before; cache hits are not delayed.
+        Concurrent mode keeps at most 2 x workers fetches in flight, so a
+        consumer that stops early (e.g. combo full) wastes little work.
+        """
+        if self._pool is None:
+            lo, hi = delay or self.delay
+            for url in urls:
+                cached = self.cache is not None and self.cache.will_serve(url)
+                yield url, self.fetch(url)
+                if not cached:
+                    random_delay(lo, hi)
+            return
+
+        url_iter = iter(urls)
+        window = deque()
+
+        def _submit_next() -> bool:
+            url = next(url_iter, None)
+            if url is None:
+                return False
+            window.append((url, self._pool.submit(self.fetch, url)))
+            return True
+
+        try:
+            for _ in range(self.workers * 2):
+                if not _submit_next():
+                    break
+            while window:
+                url, future = window.popleft()
+                html = future.result()
+                _submit_next()
+                yield url, html
+        finally:
+            for _, future in window:
+                future.cancel()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------------------------------------------------------------
+# Search engine rate governor (AIMD pacing + circuit breaker)
+# ---------------------------------------------------------------------------
+
+
+def is_blocked_page(html: str) -> bool:
+    """Whether a search response is Sogou's "too frequent" / antispider page."""
+    return "用户您好，您的访问过于频繁" in html or "antispider" in html
+
+
+class RateGovernor:
+    """Shared pacing for the search engines, persisted across runs.
+
+    Each engine keeps its own gap between requests: clean responses shrink
+    it additively (GOVERNOR_STEP), an anti-bot page doubles it. A block
+    also opens that engine's circuit for a cooldown that doubles with every
+    consecutive block; while it is open acquire() refuses immediately
+    instead of sleeping, so the caller can get on with other engines or
+    article fetches. After the cooldown one probe request is let through;
+    success closes the circuit, another block reopens it for longer.
+
+    Gaps, block streaks and cooldown deadlines are saved to GOVERNOR_FILE
+    (wall-clock deadlines), so a --resume right after a block still waits.
+    """
+
+    def __init__(self, path: Path | None = GOVERNOR_FILE, pacing: dict = ENGINE_PACING):
+        self.path = path
+        self.pacing = pacing
+        self._lock = threading.Lock()
+        self._last_request: dict[str, float] = {}
+        self.state: dict[str, dict] = {
+            engine: {"interval": initial, "blocks": 0, "open_until": 0.0}
+            for engine, (_, initial, _) in pacing.items()
+        }
+        if path is not None and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except ValueError:
+                saved = {}
+            for engine, state in saved.items():
+                if engine in self.state:
+                    self.state[engine].update(state)
+
+    def available(self, engine: str) -> bool:
+        return time.time() >= self.state[engine]["open_until"]
+
+    def seconds_until_available(self, engines=None) -> float:
+        """Seconds until the first of engines (default: all) may be used again."""
+        now = time.time()
+        return max(0.0, min(self.state[engine]["open_until"] - now
+                            for engine in (engines or self.state)))
+
+    def acquire(self, engine: str) -> bool:
+        """Wait for engine's next request slot; False at once if its circuit is open."""
+        with self._lock:
+            state = self.state[engine]
+            if time.time() < state["open_until"]:
+                return False
+            now = time.monotonic()
+            gap = state["interval"] * random.uniform(0.75, 1.25)
+            slot = max(now, self._last_request.get(engine, now - gap) + gap)
+            self._last_request[engine] = slot
+        if slot > now:
+            time.sleep(slot - now)
+            METRICS.observe("backoff", slot - now)
+        return True
+
+    def record_success(self, engine: str):
+        lo, _, _ = self.pacing[engine]
+        with self._lock:
+            state = self.state[engine]
+            state["interval"] = max(lo, state["interval"] - GOVERNOR_STEP)
+            if state["blocks"]:
+                print(f"  [GOVERNOR] {engine} recovered, circuit closed")
+            state["blocks"] = 0
+
+    def record_block(self, engine: str):
+        with self._lock:
+            _, _, hi = self.pacing[engine]
+            state = self.state[engine]
+            state["blocks"] += 1
+            state["interval"] = interval = min(hi, state["interval"] * 2)
+            cooldown = min(GOVERNOR_MAX_COOLDOWN, GOVERNOR_COOLDOWN * 2 ** (state["blocks"] - 1))
+            state["open_until"] = time.time() + cooldown
+        print(f"  [BLOCKED] {engine} anti-bot page; pausing {engine} for {cooldown:.0f}s, "
+              f"request gap now {interval:.1f}s")
+        self.save()
+
+    def save(self):
+        if self.path is not None:
+            with self._lock:
+                state = {engine: dict(s) for engine, s in self.state.items()}
+            atomic_write_json(self.path, state, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# Search (WeChat/Sogou-based for public account articles)
+# ---------------------------------------------------------------------------
+
+
+def _search_page_html(session: requests.Session, engine: str, search_url: str,
+                      governor: RateGovernor | None) -> str | None:
+    """Fetch one result page under the governor; None on failure, block or open circuit.
+
+    Without a governor a blocked page is retried in place, sleeping longer
+    each time (SEARCH_BLOCK_ATTEMPTS, SEARCH_BLOCK_BACKOFF).
+    """
+    if governor is None:
+        for attempt in range(SEARCH_BLOCK_ATTEMPTS):
+            html = fetch_page(session, search_url, stage="search")
+            if html is None or not is_blocked_page(html):
+                return html
+            METRICS.count(f"blocked_{engine}")
+            if attempt + 1 < SEARCH_BLOCK_ATTEMPTS:
+                backoff = random.uniform(*SEARCH_BLOCK_BACKOFF) * (attempt + 1)
+                print(f"  [BLOCKED] {engine} anti-bot page (attempt {attempt + 1}/{SEARCH_BLOCK_ATTEMPTS}), "
+                      f"waiting {backoff:.0f}s...")
                 time.sleep(backoff)
-                html = None
-                continue
-            break  # Got valid response
+                METRICS.observe("backoff", backoff)
+        print(f"  [BLOCKED] {engine} anti-bot page for {search_url}, giving up")
+        return None
+
+    if not governor.acquire(engine):
+        return None
+    html = fetch_page(session, search_url, stage="search")
+    if html is None:
+        return None
+    if is_blocked_page(html):
+        METRICS.count(f"blocked_{engine}")
+        governor.record_block(engine)
+        return None
+    governor.record_success(engine)
+    return html
+
+
+def weixin_sogou_search_page(session: requests.Session, query: str, page: int,
+                             governor: RateGovernor | None = None) -> list[str] | None:
+    """Fetch one Sogou WeChat result page. Returns article URLs, or None on failure."""
+    search_url = f"{WEIXIN_SEARCH_BASE}/weixin?type=2&query={quote(query)}&page={page}"
+    html = _search_page_html(session, "weixin", search_url, governor)
+    if html is None:
+        return None
+
+    soup = BeautifulSoup(html, "lxml")
 
-        if html is None:
+    # Sogou WeChat results: <div class="txt-box"><h3><a href="/link?url=...">
+    urls = []
+    for a in soup.select("div.txt-box h3 a[href]"):
+        href = a.get("href", "")
+        if not href:
             continue
+        # Resolve relative Sogou redirect links
+        if href.startswith("/link?"):
+            href = WEIXIN_SEARCH_BASE + href
+        if href.startswith("http"):
+            urls.append(href)
+    return urls
 
-        soup = BeautifulSoup(html, "lxml")
 
-        # Sogou WeChat results: <div class="txt-box"><h3><a href="/link?url=...">
-        for a in soup.select("div.txt-box h3 a[href]"):
-            href = a.get("href", "")
-            if not href:
-                continue
-            # Resolve relative Sogou redirect links
-            if href.startswith("/link?"):
-                href = "https://weixin.sogou.com" + href
-            if href.startswith("http"):
-                urls.append(href)
+def sogou_search_page(session: requests.Session, query: str, page: int,
+                      governor: RateGovernor | None = None) -> list[str] | None:
+    """Fetch one Sogou web result page. Returns result URLs, or None on failure."""
+    search_url = f"{SOGOU_SEARCH_BASE}/web?query={quote(query)}&page={page}"
+    html = _search_page_html(session, "sogou", search_url, governor)
+    if html is None:
+        return None
+
+    soup = BeautifulSoup(html, "lxml")
 
-        random_delay(10, 20)
+    urls = []
+    for result in soup.select("div.vrwrap a[href], div.rb a[href], h3 a[href]"):
+        href = result.get("href", "")
+        if href.startswith("http") and "sogou.com" not in href:
+            urls.append(href)
+    return urls
+
+
+# engine -> (page function, max result pages); pacing comes from RateGovernor
+SEARCH_ENGINES = {
+    "weixin": (weixin_sogou_search_page, 3),
+    "sogou": (sogou_search_page, 2),
+}
 
+
+def use_search_base(base: str):
+    """Point both engines at another host, e.g. scripts/sogou_stub_server.py."""
+    global WEIXIN_SEARCH_BASE, SOGOU_SEARCH_BASE
+    WEIXIN_SEARCH_BASE = SOGOU_SEARCH_BASE = base.rstrip("/")
+
+
+def weixin_sogou_search_urls(session: requests.Session, query: str, pages: int = 3,
+                             governor: RateGovernor | None = None) -> list[str]:
+    """Search WeChat articles via Sogou WeChat search. Returns article URLs."""
+    urls = []
+    for page in range(1, pages + 1):
+        if governor is not None and not governor.available("weixin"):
+            break
+        found = weixin_sogou_search_page(session, query, page, governor)
+        if found is None:
+            continue
+        urls.extend(found)
+        if governor is None:
+            random_delay(10, 20)
     return urls
 
 
-def sogou_search_urls(session: requests.Session, query: str, pages: int = 2) -> list[str]:
+def sogou_search_urls(session: requests.Session, query: str, pages: int = 2,
+                      governor: RateGovernor | None = None) -> list[str]:
     """Search Sogou web as fallback engine."""
     urls = []
-    for page in range(pages):
-        search_url = f"https://www.sogou.com/web?query={quote(query)}&page={page+1}"
-
-        html = fetch_page(session, search_url)
-        if html is None:
+    for page in range(1, pages + 1):
+        if governor is not None and not governor.available("sogou"):
+            break
+        found = sogou_search_page(session, query, page, governor)
+        if found is None:
             continue
+        urls.extend(found)
+        if governor is None:
+            random_delay(2, 4)
+    return urls
 
-        soup = BeautifulSoup(html, "lxml")
 
-        for result in soup.select("div.vrwrap a[href], div.rb a[href], h3 a[href]"):
-            href = result.get("href", "")
-            if href.startswith("http") and "sogou.com" not in href:
-                urls.append(href)
+# ---------------------------------------------------------------------------
+# Search result (SERP) cache
+# ---------------------------------------------------------------------------
 
-        random_delay(2, 4)
 
-    return urls
+@lru_cache(maxsize=1)
+def _synonym_labels() -> dict[str, str]:
+    """Relationship/style synonym (or label) -> its label."""
+    labels = {}
+    for synonyms, names in ((REL_SYNONYMS, REL_LABELS), (STYLE_SYNONYMS, STYLE_LABELS)):
+        for key, terms in synonyms.items():
+            for term in terms:
+                labels[term] = names[key]
+            labels[names[key]] = names[key]
+    return labels
+
+
+def canonical_query(query: str, merge_synonyms: bool = True) -> str:
+    """Order-free, filler-free form of a query.
+
+    With merge_synonyms, build_queries' random synonym picks for the same
+    template share one form: "新春 父母 庄重 祝福语 精选" and
+    "新春 爸妈 典雅 祝福语 最新" both become "新春 正式 祝福语 长辈".
+    The adaptive scheduler keeps synonyms apart, since it ranks them.
+    """
+    labels = _synonym_labels() if merge_synonyms else {}
+    terms = {labels.get(term, term)
+             for term in unicodedata.normalize("NFKC", query).lower().split()
+             if term not in QUERY_FILLERS}
+    return " ".join(sorted(terms))
+
+
+class SerpCache:
+    """Persistent parsed result links: "<engine>|<canonical query>|<page>" -> {"fetched_at", "urls"}.
+
+    Only successfully parsed pages are stored (an empty result list is a
+    result); failures and anti-bot pages are not. Expired entries are
+    dropped on load.
+    """
+
+    def __init__(self, path: Path = SERP_CACHE_FILE, ttl: float = SERP_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries: dict[str, dict] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print(f"  [WARN] Ignoring unreadable SERP cache {path}")
+        now = time.time()
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if now - entry["fetched_at"] <= ttl}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(engine: str, query: str, page: int, merge_synonyms: bool = True) -> str:
+        return f"{engine}|{canonical_query(query, merge_synonyms)}|{page}"
+
+    def get(self, engine: str, query: str, page: int, merge_synonyms: bool = True) -> list[str] | None:
+        entry = self.entries.get(self.key(engine, query, page, merge_synonyms))
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        return entry["urls"]
+
+    def put(self, engine: str, query: str, page: int, urls: list[str], merge_synonyms: bool = True):
+        self.entries[self.key(engine, query, page, merge_synonyms)] = {"fetched_at": time.time(),
+                                                                       "urls": urls}
+        self._dirty = True
+
+    def save(self):
+        if self._dirty:
+            atomic_write_json(self.path, self.entries)
+            self._dirty = False
 
 
 # ---------------------------------------------------------------------------
@@ -468,6 +2256,143 @@ def build_long_queries(rel: str, style: str) -> list[str]:
     ]
 
 
+# ---------------------------------------------------------------------------
+# Adaptive query scheduling
+# ---------------------------------------------------------------------------
+
+
+class QueryPlan(NamedTuple):
+    engine: str
+    query: str
+    terms: tuple[str, ...]  # synonyms / hints the query was built from
+    long: bool = False      # aimed at long-form blessings
+
+
+def query_candidates(rel: str, style: str) -> list[QueryPlan]:
+    """Every query the scheduler may run for a combo, on every engine.
+
+    Same templates as build_queries/build_long_queries, but enumerating all
+    synonym pairs and long hints instead of sampling them.
+    """
+    rel_label = REL_LABELS[rel]
+    style_label = STYLE_LABELS[style]
+    queries = [(f"春节祝福语 {rel_label} {style_label} 大全", (rel_label, style_label), False)]
+    for rel_syn in REL_SYNONYMS[rel]:
+        for style_syn in STYLE_SYNONYMS[style]:
+            queries.append((f"新年祝福 {rel_syn} {style_syn}", (rel_syn, style_syn), False))
+    for hint in LONG_HINTS:
+        queries.append((f"春节 {rel_label} {hint} 祝福语 {style_label}", (rel_label, hint, style_label), True))
+    queries.append((f"新年 {rel_label} 长篇祝福 贺词", (rel_label, "长篇祝福"), True))
+    return [QueryPlan(engine, query, terms, long)
+            for engine in SEARCH_ENGINES
+            for query, terms, long in queries]
+
+
+class SearchStats:
+    """Persistent yield counters for queries, query terms, engines and result pages.
+
+    Each counter is {"requests", "accepted", "short", "medium", "long"}:
+    requests spent (SERP pages plus article fetches), blessings accepted
+    anywhere, and blessings accepted into the searched combo per length.
+    Keys are "q:<engine>|<query>", "t:<term>", "e:<engine>" and
+    "p:<engine>#<page>".
+    """
+
+    def __init__(self, path: Path = SEARCH_STATS_FILE):
+        self.path = path
+        self.counters: dict[str, dict[str, int]] = {}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.counters = json.load(f)
+            except ValueError:
+                print(f"  [WARN] Ignoring unreadable search stats {path}")
+
+    def get(self, key: str) -> dict[str, int]:
+        return self.counters.get(key) or {"requests": 0, "accepted": 0,
+                                          "short": 0, "medium": 0, "long": 0}
+
+    def record(self, plan: QueryPlan, page: int, requests: int, accepted: int,
+               gained: dict[str, int]):
+        keys = [f"q:{plan.engine}|{plan.query}", f"e:{plan.engine}", f"p:{plan.engine}#{page}"]
+        keys.extend(f"t:{term}" for term in plan.terms)
+        for key in keys:
+            counter = self.counters.setdefault(key, self.get(key))
+            counter["requests"] += requests
+            counter["accepted"] += accepted
+            for length, n in gained.items():
+                counter[length] += n
+
+    @staticmethod
+    def rate(counter: dict[str, int], field: str, prior: float, weight: float = 2.0) -> float:
+        """Per-request rate of a field, smoothed towards prior."""
+        return (counter[field] + prior * weight) / (counter["requests"] + weight)
+
+    def save(self):
+        atomic_write_json(self.path, self.counters)
+
+
+class QueryScheduler:
+    """Decides which combo to search next, with which query, and for how many pages.
+
+    Combos are taken emptiest first. Each query is scored by its expected
+    accepted blessings per request for the lengths the combo still lacks:
+    its own history, smoothed towards the history of its terms and engine,
+    so synonyms and hints that filled gaps before are tried first.
+    """
+
+    def __init__(self, stats: SearchStats, target: int = TARGET_PER_BUCKET):
+        self.stats = stats
+        self.target = target
+
+    def deficit(self, counts: dict[str, int]) -> float:
+        return sum((self.target - counts[length]) * (LONG_DEFICIT_WEIGHT if length == "long" else 1)
+                   for length in LENGTHS if counts[length] < self.target)
+
+    def next_combo(self, combo_counts: dict[tuple[str, str], dict[str, int]]) -> tuple[str, str] | None:
+        """The combo with the largest weighted deficit, or None when all are full."""
+        best = max(combo_counts, key=lambda combo: self.deficit(combo_counts[combo]), default=None)
+        if best is None or self.deficit(combo_counts[best]) == 0:
+            return None
+        return best
+
+    def estimate(self, plan: QueryPlan, counts: dict[str, int]) -> float:
+        engine = self.stats.get(f"e:{plan.engine}")
+        terms = [self.stats.get(f"t:{term}") for term in plan.terms]
+        own = self.stats.get(f"q:{plan.engine}|{plan.query}")
+        score = 0.0
+        for length in LENGTHS:
+            missing = self.target - counts[length]
+            if missing <= 0:
+                continue
+            prior = 0.5 if (length == "long") == plan.long else 0.2
+            prior = self.stats.rate(engine, length, prior)
+            if terms:
+                prior = sum(self.stats.rate(t, length, prior) for t in terms) / len(terms)
+            weight = LONG_DEFICIT_WEIGHT if length == "long" else 1
+            score += missing * weight * self.stats.rate(own, length, prior)
+        return score
+
+    def next_query(self, rel: str, style: str, counts: dict[str, int],
+                   tried: set[tuple[str, str]], engines=None) -> QueryPlan | None:
+        """Best untried query for the combo, on one of engines (default: any)."""
+        plans = [plan for plan in query_candidates(rel, style)
+                 if (plan.engine, plan.query) not in tried
+                 and (engines is None or plan.engine in engines)]
+        if not plans:
+            return None
+        return max(plans, key=lambda plan: self.estimate(plan, counts))
+
+    def page_worthwhile(self, engine: str, page: int) -> bool:
+        """Whether result page `page` of an engine has historically paid off."""
+        if page == 1:
+            return True
+        counter = self.stats.get(f"p:{engine}#{page}")
+        if counter["requests"] < SCHEDULER_MIN_SAMPLES:
+            return True
+        return counter["accepted"] / counter["requests"] >= SCHEDULER_MIN_YIELD
+
+
 # ---------------------------------------------------------------------------
 # Content extraction
 # ---------------------------------------------------------------------------
@@ -498,18 +2423,17 @@ def extract_blessings_from_html(html: str) -> list[str]:
     for p in soup.find_all("p"):
         text = p.get_text(strip=True)
         # Some pages put multiple blessings in one <p> separated by numbers
-        parts = re.split(r"[\d一二三四五六七八九十]+[、.．）)]\s*", text)
+        parts = NUMBERED_SPLIT_RE.split(text)
         for part in parts:
             _add(part)
 
     # Strategy 3: Content divs
-    for div in soup.find_all("div", class_=re.compile(
-            r"content|text|article|blessing|item|card|post|entry|body", re.I)):
+    for div in soup.find_all("div", class_=CONTENT_CLASS_RE):
         text = div.get_text(separator="\n", strip=True)
         for line in text.split("\n"):
             line = line.strip()
             # Strip number prefix
-            cleaned = re.sub(r"^[\d一二三四五六七八九十]+[、.．）)\.]?\s*", "", line)
+            cleaned = LINE_NUMBER_PREFIX_RE.sub("", line)
             _add(cleaned)
 
     # Strategy 4: Strong/b tags often wrap individual blessings
@@ -519,20 +2443,150 @@ def extract_blessings_from_html(html: str) -> list[str]:
     return candidates
 
 
+def extract_blessings_streaming(html: str, chunk_size: int = 64 * 1024) -> list[str]:
+    """Single-pass lxml equivalent of extract_blessings_from_html.
+
+    Feeds the page to an lxml HTMLPullParser in chunks and collects the
+    candidates of all four strategies (li, numbered p, content divs,
+    strong/b) in one traversal, returning the same list in the same order.
+
+    Every text node is stripped and appended once to a flat list as soon
+    as it is complete; an element's text is then just a slice of that list,
+    so nested elements are never re-walked. Text is only kept while some
+    candidate element is open, and finished subtrees are dropped from the
+    parse tree, which keeps memory bounded on large articles.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end", "comment", "pi"), encoding="utf-8")
+
+    # Per strategy: one slot per matching element in document (start-tag)
+    # order, filled with that element's raw candidates when it ends.
+    slots: tuple[list, list, list, list] = ([], [], [], [])
+    open_elements: list[tuple] = []  # (element, strategy, slot, offset into strings)
+    strings: list[str] = []
+    skipping = None
+
+    def emit(text):
+        if text and open_elements:
+            text = text.strip()
+            if text:
+                strings.append(text)
+
+    def strategy_of(el) -> int | None:
+        tag = el.tag
+        if tag == "li":
+            return 0
+        if tag == "p":
+            return 1
+        if tag == "div":
+            cls = el.get("class")
+            return 2 if cls and CONTENT_CLASS_RE.search(cls) else None
+        if tag in ("strong", "b"):
+            return 3
+        return None
+
+    def on_child_start(el):
+        # Text before el is complete: the previous sibling's tail, or the
+        # parent's own text if el is its first child.
+        parent = el.getparent()
+        prev = el.getprevious()
+        if prev is not None:
+            emit(prev.tail)
+            # prev is fully consumed; drop it (and any earlier siblings)
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+        elif parent is not None:
+            emit(parent.text)
+
+    def on_end(strategy, slot, start):
+        joined = strings[start:]
+        if strategy == 1:
+            # Some pages put multiple blessings in one <p> separated by numbers
+            slots[1][slot] = NUMBERED_SPLIT_RE.split("".join(joined))
+        elif strategy == 2:
+            slots[2][slot] = [LINE_NUMBER_PREFIX_RE.sub("", line.strip())
+                              for line in "\n".join(joined).split("\n")]
+        else:
+            slots[strategy][slot] = ["".join(joined)]
+
+    def handle(event, el):
+        nonlocal skipping
+        if skipping is not None:
+            if event == "end" and el is skipping:
+                skipping = None
+            return
+
+        if event in ("comment", "pi"):
+            on_child_start(el)
+            return
+
+        if event == "start":
+            on_child_start(el)
+            # <template> content is kept by BeautifulSoup, but get_text() never
+            # returns TemplateString, so it can never produce a candidate either
+            if el.tag in _EXTRACT_SKIP_TAGS or el.tag == "template":
+                skipping = el
+                return
+            strategy = strategy_of(el)
+            if strategy is not None:
+                open_elements.append((el, strategy, len(slots[strategy]), len(strings)))
+                slots[strategy].append(None)
+            return
+
+        # end: the last piece of el's own text is now complete
+        if len(el):
+            emit(el[-1].tail)
+            del el[:]
+        else:
+            emit(el.text)
+        if open_elements and open_elements[-1][0] is el:
+            _, strategy, slot, start = open_elements.pop()
+            on_end(strategy, slot, start)
+            if not open_elements:
+                strings.clear()
+
+    data = html.encode("utf-8")
+    for pos in range(0, len(data), chunk_size):
+        parser.feed(data[pos:pos + chunk_size])
+        for event, el in parser.read_events():
+            handle(event, el)
+    try:
+        parser.close()
+    except etree.LxmlError:
+        pass
+    for event, el in parser.read_events():
+        handle(event, el)
+
+    candidates = []
+    seen = set()
+    for strategy in slots:
+        for texts in strategy:
+            for text in texts or ():
+                text = text.strip()
+                if text and text not in seen and count_chinese_chars(text) >= 4:
+                    seen.add(text)
+                    candidates.append(text)
+    return candidates
+
+
 def clean_blessing_text(text: str) -> str:
     """Clean a raw blessing text candidate."""
     # Remove number prefixes
-    text = re.sub(r"^[\d一二三四五六七八九十]+[、.．）)]\s*", "", text)
-    text = re.sub(r"^\s*[（(]\d+[)）]\s*", "", text)
+    text = NUMBER_PREFIX_RE.sub("", text)
+    text = PAREN_NUMBER_PREFIX_RE.sub("", text)
 
-    # Remove leading/trailing dashes
+    # Remove leading/trailing dashes (the text is stripped, so a trailing
+    # dash run can only exist if the last character is a dash)
     text = text.strip()
-    text = re.sub(r"^[—\-–]+\s*", "", text)
-    text = re.sub(r"\s*[—\-–]+$", "", text)
+    text = LEADING_DASH_RE.sub("", text)
+    if text[-1:] in ("—", "-", "–"):
+        text = TRAILING_DASH_RE.sub("", text)
 
-    # Collapse whitespace
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    # Collapse whitespace (single spaces are already collapsed)
+    if "\t" in text or "  " in text:
+        text = INLINE_SPACE_RE.sub(" ", text)
+    if "\n\n\n" in text:
+        text = BLANK_LINES_RE.sub("\n\n", text)
 
     return text.strip()
 
@@ -555,95 +2609,1143 @@ def filter_blessing(text: str) -> bool:
     return True
 
 
+# Candidate extractor backends, selectable with --extractor
+EXTRACTORS = {
+    "bs4": extract_blessings_from_html,
+    "lxml": extract_blessings_streaming,
+}
+DEFAULT_EXTRACTOR = "lxml"
+
+
+def extract_page_candidates(html: str, extractor: str = DEFAULT_EXTRACTOR
+                            ) -> list[tuple[str, str, str | None, str | None]]:
+    """Run one page through extraction -> cleaning -> filtering -> detection.
+
+    Returns (raw_text, cleaned_text, detected_rel, detected_style) for every
+    candidate that passes filter_blessing. Pure function of the HTML, so it
+    can run in a worker process.
+    """
+    with METRICS.stage("extract"):
+        candidates = EXTRACTORS[extractor](html)
+    return classify_candidates(candidates)
+
+
+def classify_candidates(candidates: list[str]) -> list[tuple[str, str, str | None, str | None]]:
+    """Clean, filter and detect rel/style once for a page's raw candidates.
+
+    Filtering and detection run as one batch (see text_features); the
+    filter/classify stages record each candidate's share of the batch time.
+    """
+    if not candidates:
+        return []
+    started = time.perf_counter()
+    texts = [clean_blessing_text(raw) for raw in candidates]
+    features = text_features(texts) if np is not None else None
+    passed = filter_blessing_batch(texts, features)
+    filtered = time.perf_counter()
+    METRICS.observe("filter", (filtered - started) / len(texts), len(texts))
+    kept = [i for i, ok in enumerate(passed) if ok]
+    if not kept:
+        return []
+    texts = [texts[i] for i in kept]
+    if features is not None:
+        features = TextFeatures(*(column[kept] for column in features))
+    rels = detect_relationship_batch(texts, features)
+    styles = detect_style_batch(texts, features)
+    METRICS.observe("classify", (time.perf_counter() - filtered) / len(kept), len(kept))
+    return [(candidates[i], text, rel, style) for i, text, rel, style in zip(kept, texts, rels, styles)]
+
+
+def extract_fetched_page(html: str, extractor: str = DEFAULT_EXTRACTOR,
+                         classify: bool = False) -> "FetchedPage":
+    """Extract a freshly fetched page; classified only in shared-pool mode."""
+    with METRICS.stage("extract"):
+        candidates = EXTRACTORS[extractor](html)
+    return FetchedPage(hashlib.sha1(html.encode("utf-8")).hexdigest(), html, candidates,
+                       classify_candidates(candidates) if classify else None)
+
+
+def _extract_fetched_job(job: tuple[str, str | None, str, bool]):
+    """Process-pool worker for --cpu-workers: (url, html, extractor, classify) -> (FetchedPage, stages).
+
+    The html is not sent back; the caller still holds it. stages are this
+    job's METRICS histograms, merged into the writer's METRICS.
+    """
+    _, html, extractor, classify = job
+    if html is None:
+        return None, {}
+    page = extract_fetched_page(html, extractor, classify)._replace(html=None)
+    return page, METRICS.export_stages(reset=True)
+
+
+def _init_extraction_worker():
+    """Pool initializer: drop METRICS inherited from the parent at fork."""
+    METRICS.reset()
+
+
+def bounded_imap(pool: "multiprocessing.pool.Pool", fn, items, window: int):
+    """Yield (item, fn(item)) in input order with at most window items in flight.
+
+    Unlike Pool.imap, which drains its input as fast as it can, the input is
+    only advanced as results are consumed, so a slow consumer throttles both
+    the process pool and whatever produces the items (e.g. the fetch threads).
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.apply_async(fn, (item,))))
+        if len(pending) >= window:
+            item, result = pending.popleft()
+            yield item, result.get()
+    while pending:
+        item, result = pending.popleft()
+        yield item, result.get()
+
+
+def _extract_archived_page(job: tuple[str, str | None, str]):
+    """Process-pool worker for --reprocess: (sha1, html or None, extractor) -> (sha1, candidates, stages)."""
+    sha1, html, extractor = job
+    if html is None:
+        return sha1, None, {}
+    return sha1, extract_page_candidates(html, extractor), METRICS.export_stages(reset=True)
+
+
 # ---------------------------------------------------------------------------
-# Main scraping logic
+# Page archive (raw snapshots for offline re-extraction)
 # ---------------------------------------------------------------------------
 
 
-class BlessingScraper:
-    def __init__(self, resume: bool = False):
-        self.session = create_session()
-        self.blessings: dict[str, dict[str, dict[str, list[dict]]]] = {}
+class PageArchive:
+    """Append-only, gzip-compressed JSONL log of every page the scraper used.
+
+    One record per page visit:
+        {"url", "fetched_at", "sha1", "rel", "style", "html"?}
+    rel/style are the combo the page was scraped for, or null for Phase 1
+    pages that were auto-classified. The html body is only written the first
+    time its sha1 is seen in a run; later visits refer back to it. Each run
+    appends a new gzip member, which gzip.open reads back transparently; a
+    member left unterminated by a killed run is closed off (see repair)
+    before the next run appends after it.
+    """
+
+    def __init__(self, path: Path = PAGE_ARCHIVE_FILE):
+        self.path = path
+        self._file = None
+        self._stored: set[str] = set()
+
+    def record(self, url: str, html: str | None, rel: str | None = None,
+               style: str | None = None, sha1: str | None = None):
+        """Log a page visit; html may be None for a page already stored this run."""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.repair(self.path)
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+        if sha1 is None:
+            sha1 = hashlib.sha1(html.encode("utf-8")).hexdigest()
+        rec = {"url": url, "fetched_at": time.time(), "sha1": sha1, "rel": rel, "style": style}
+        if html is not None and sha1 not in self._stored:
+            rec["html"] = html
+            self._stored.add(sha1)
+        self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _complete_length(path: Path) -> int:
+        """Bytes taken by the complete gzip members at the start of path."""
+        complete = offset = 0
+        member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                while chunk:
+                    try:
+                        member.decompress(chunk)
+                    except zlib.error:
+                        return complete
+                    if not member.eof:
+                        offset += len(chunk)
+                        break
+                    offset += len(chunk) - len(member.unused_data)
+                    complete = offset
+                    chunk = member.unused_data
+                    member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return complete
+
+    @staticmethod
+    def repair(path: Path = PAGE_ARCHIVE_FILE) -> int:
+        """Close off a member left unterminated by a killed run.
+
+        The file is cut back to its complete members and the readable lines
+        of the unfinished one are rewritten as a member of their own, through
+        a temp file and rename. Returns the number of records salvaged.
+        """
+        if not path.exists():
+            return 0
+        complete = PageArchive._complete_length(path)
+        if complete == path.stat().st_size:
+            return 0
+        salvaged = 0
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            remaining = complete
+            while remaining:
+                chunk = src.read(min(remaining, 1 << 20))
+                dst.write(chunk)
+                remaining -= len(chunk)
+            member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            pending = b""
+            broken = False
+            with gzip.GzipFile(fileobj=dst, mode="wb") as out:
+                while not broken and (chunk := src.read(1 << 16)):
+                    saved = member.copy()
+                    try:
+                        pending += member.decompress(chunk)
+                    except zlib.error:
+                        # zlib drops a failed call's output, so replay the
+                        # chunk a byte at a time up to the damage
+                        member, broken = saved, True
+                        for i in range(len(chunk)):
+                            try:
+                                pending += member.decompress(chunk[i:i + 1])
+                            except zlib.error:
+                                break
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        out.write(line + b"\n")
+                    salvaged += len(lines)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, path)
+        print(f"  [WARN] Page archive {path.name} ended mid-run; kept {salvaged} records of that run")
+        return salvaged
+
+    @staticmethod
+    def iter_records(path: Path = PAGE_ARCHIVE_FILE):
+        """Stream records back; a truncated tail from a crashed run is ignored."""
+        if not path.exists():
+            return
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        return
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            return
+
+
+# ---------------------------------------------------------------------------
+# URL frontier (per-URL crawl state kept across runs)
+# ---------------------------------------------------------------------------
+
+
+class FetchedPage(NamedTuple):
+    """A page extracted once per run; html is None when shared from memory.
+
+    classified holds classify_candidates(candidates) in shared-pool mode.
+    """
+    sha1: str
+    html: str | None
+    candidates: list[str]
+    classified: list | None = None
+
+
+class UrlFrontier:
+    """Persistent fetch status and yield of every URL the scraper has seen.
+
+    url -> {"status", "sha1", "last_fetch", "fetches", "failures",
+            "candidates", "accepted"}
+    candidates is what the extractor found on the last fetch, which does
+    not depend on the combo; accepted counts the blessings the page has
+    yielded over all runs. This state outlives the corpus (a fresh run
+    keeps it) and is used to skip pages that keep failing or hold no
+    candidates, and to fetch pages it has never seen before pages it has
+    already processed.
+    """
+
+    def __init__(self, path: Path = FRONTIER_FILE, recheck_after: float = FRONTIER_RECHECK):
+        self.path = path
+        self.recheck_after = recheck_after
+        self.urls: dict[str, dict] = {}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.urls = json.load(f)
+            except ValueError:
+                print(f"  [WARN] Ignoring unreadable frontier {path}")
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def record_fetch(self, url: str, sha1: str | None):
+        """Record a fetch attempt; sha1 is None when it failed."""
+        entry = self.urls.setdefault(url, {"status": None, "sha1": None, "fetches": 0,
+                                           "failures": 0, "candidates": 0, "accepted": 0})
+        entry["last_fetch"] = time.time()
+        entry["fetches"] += 1
+        if sha1 is None:
+            entry["status"] = "failed"
+            entry["failures"] += 1
+        else:
+            entry["status"] = "ok"
+            entry["sha1"] = sha1
+            entry["failures"] = 0
+
+    def record_yield(self, url: str, candidates: int, accepted: int):
+        entry = self.urls.get(url)
+        if entry is not None:
+            entry["candidates"] = candidates
+            entry["accepted"] += accepted
+
+    def skip_reason(self, url: str) -> str | None:
+        """Why url is not worth fetching again yet, or None."""
+        entry = self.urls.get(url)
+        if entry is None or time.time() - entry.get("last_fetch", 0) > self.recheck_after:
+            return None
+        if entry["status"] == "failed" and entry["failures"] >= FRONTIER_MAX_FAILURES:
+            return "failing"
+        if entry["status"] == "ok" and entry["candidates"] == 0:
+            return "empty"
+        return None
+
+    def order(self, urls: list[str]) -> list[str]:
+        """New pages first, then already processed ones: productive (best first), then the rest.
+
+        A combo stops once its buckets are full, so pages seen in earlier
+        runs are usually never refetched; when they are, the ones that
+        yielded blessings before come first.
+        """
+        def _key(url):
+            entry = self.urls.get(url)
+            if entry is None:
+                return 0, 0
+            if entry["accepted"] > 0:
+                return 1, -entry["accepted"]
+            return 2, 0
+        return sorted(urls, key=_key)
+
+    def save(self):
+        atomic_write_json(self.path, self.urls)
+
+
+# ---------------------------------------------------------------------------
+# Output store (append-only journal + atomic compaction)
+# ---------------------------------------------------------------------------
+
+
+def atomic_write_json(path: Path, data, **dump_kwargs):
+    """Write JSON to a temp file beside path, fsync it, then rename over path.
+
+    Readers (and a crash at any point) see either the old file or the new
+    one, never a half-written mix.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def atomic_write_text(path: Path, chunks):
+    """atomic_write_json for a body produced piece by piece."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BlessingJournal:
+    """Append-only JSONL log of accepted blessings.
+
+    One line per blessing as it is accepted:
+        {"rel", "style", "length", "text", "char_count", "source_url"}
+    and one per page processed for a combo (Phase 1 pages use combo ""):
+        {"crawled": url, "combo"}
+    Lines are flushed as they are written and fsynced at checkpoints, so a
+    crash loses at most the tail of the current combo. blessings.json is
+    only a compaction of this log (see BlessingScraper._save_output).
+    """
+
+    def __init__(self, path: Path = JOURNAL_FILE):
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._repair_tail()
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _repair_tail(self):
+        """Cut a torn last line left by a crash so new appends start clean."""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            cut = tail.rfind(b"\n")
+            f.truncate(size - len(tail) + cut + 1 if cut >= 0 else max(0, size - len(tail)))
+
+    def append(self, rel: str, style: str, length: str, item: dict):
+        f = self._open()
+        f.write(json.dumps({"rel": rel, "style": style, "length": length, **item},
+                           ensure_ascii=False) + "\n")
+        f.flush()
+
+    def append_crawled(self, url: str, combo: str):
+        f = self._open()
+        f.write(json.dumps({"crawled": url, "combo": combo}, ensure_ascii=False) + "\n")
+        f.flush()
+
+    def sync(self):
+        """Make everything appended so far durable."""
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+
+    def rewrite(self, entries):
+        """Atomically replace the journal with (rel, style, length, item) entries."""
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rel, style, length, item in entries:
+                f.write(json.dumps({"rel": rel, "style": style, "length": length, **item},
+                                   ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def replay(self):
+        """Yield records in append order; a torn last line is ignored."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+
+# ---------------------------------------------------------------------------
+# Corpus stores (in-memory + journal, or SQLite)
+# ---------------------------------------------------------------------------
+
+
+def normalized_hash(normalized: str) -> int:
+    """Stable signed 64-bit hash of a normalized text (SQLite INTEGER key)."""
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _empty_buckets() -> dict[str, dict[str, dict[str, list[dict]]]]:
+    return {rel: {style: {length: [] for length in LENGTHS} for style in STYLES}
+            for rel in RELATIONSHIPS}
+
+
+def _iter_output_file(path: Path = OUTPUT_FILE):
+    """Yield (rel, style, length, item) from a blessings.json written by _save_output."""
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    blessings = data.get("blessings", {})
+    for rel in RELATIONSHIPS:
+        for style in STYLES:
+            for length in LENGTHS:
+                for item in blessings.get(rel, {}).get(style, {}).get(length, []):
+                    yield rel, style, length, item
+
+
+class MemoryCorpus:
+    """Default store: nested dicts in memory, journaled to JSONL.
+
+    Dedup uses an in-memory normalized set and NearDuplicateIndex; resume
+    replays the journal (or an older blessings.json when there is none).
+    """
+
+    def __init__(self, journal: BlessingJournal | None = None,
+                 dedup_threshold: float = GLOBAL_SIMILARITY_THRESHOLD):
+        # Accepted blessings are journaled as they arrive; nothing is written
+        # until a run starts (start_run), so --stats/--dry-run are read-only
+        self.journal = journal or BlessingJournal()
+        self.blessings = _empty_buckets()
         self.normalized_set: set[str] = set()
-        self.progress: dict[str, bool] = {}
-        self.resume = resume
+        self.near_index = NearDuplicateIndex(threshold=dedup_threshold)
+        self.crawled: set[tuple[str, str]] = set()
+        self._journal_replayed = False
+
+    def _load_entry(self, rel: str, style: str, length: str, item: dict):
+        bucket = self.blessings.get(rel, {}).get(style, {}).get(length)
+        if bucket is None:
+            return
+        bucket.append(item)
+        norm = normalize_text(item["text"])
+        self.normalized_set.add(norm)
+        self.near_index.add(norm, tag=(rel, style, length))
+
+    def load(self):
+        """Load existing data for resume mode."""
+        if self.journal.path.exists():
+            for rec in self.journal.replay():
+                if "crawled" in rec:
+                    self.crawled.add((rec["crawled"], rec["combo"]))
+                else:
+                    self._load_entry(rec.pop("rel"), rec.pop("style"), rec.pop("length"), rec)
+            self._journal_replayed = True
+            print(f"Replayed {len(self.normalized_set)} blessings from {self.journal.path}")
+        elif OUTPUT_FILE.exists():
+            for entry in _iter_output_file():
+                self._load_entry(*entry)
+            print(f"Loaded {len(self.normalized_set)} existing blessings")
+
+    def start_run(self, resume: bool):
+        """Make the journal match the in-memory corpus before a run appends to it.
+
+        A fresh run truncates it; resuming from an old blessings.json seeds
+        it; resuming from a replayed journal keeps appending.
+        """
+        if not self._journal_replayed:
+            self.journal.rewrite(self.entries())
+            self._journal_replayed = True
 
-        # Initialize structure
+    def load_progress(self) -> dict[str, bool]:
+        if PROGRESS_FILE.exists():
+            with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_progress(self, progress: dict[str, bool]):
+        """Checkpoint: make the journal durable, then save progress atomically."""
+        self.journal.sync()
+        atomic_write_json(PROGRESS_FILE, progress, indent=2)
+
+    def count(self, rel: str, style: str, length: str) -> int:
+        return len(self.blessings[rel][style][length])
+
+    def counts(self) -> dict[tuple[str, str, str], int]:
+        return {(rel, style, length): len(items)
+                for rel, styles in self.blessings.items()
+                for style, lengths in styles.items()
+                for length, items in lengths.items()}
+
+    def has_exact(self, normalized: str) -> bool:
+        return normalized in self.normalized_set
+
+    @property
+    def needs_signature(self) -> bool:
+        return self.near_index.needs_signature
+
+    def find_similar(self, normalized: str, signature, threshold_for) -> bool:
+        return self.near_index.find_similar(normalized, signature, threshold_for) is not None
+
+    def add(self, rel: str, style: str, length: str, item: dict, normalized: str, signature):
+        self.blessings[rel][style][length].append(item)
+        self.journal.append(rel, style, length, item)
+        self.normalized_set.add(normalized)
+        self.near_index.add(normalized, signature, tag=(rel, style, length))
+
+    def entries(self):
+        """Yield (rel, style, length, item) in output order."""
         for rel in RELATIONSHIPS:
-            self.blessings[rel] = {}
             for style in STYLES:
-                self.blessings[rel][style] = {}
                 for length in LENGTHS:
-                    self.blessings[rel][style][length] = []
+                    for item in self.blessings[rel][style][length]:
+                        yield rel, style, length, item
+
+    def bucket_entries(self, rel: str, style: str, length: str):
+        """Yield the items of one bucket in insertion order."""
+        yield from self.blessings[rel][style][length]
+
+    def record_url(self, url: str, combo: str, content_sha1: str,
+                   candidates: int, accepted: int):
+        self.crawled.add((url, combo))
+        self.journal.append_crawled(url, combo)
+
+    def is_crawled(self, url: str, combo: str) -> bool:
+        return (url, combo) in self.crawled
+
+    def checkpoint(self):
+        self.journal.sync()
+
+    def close(self):
+        self.journal.close()
+
+
+class SqliteCorpus:
+    """SQLite store, for bucket targets too large to keep the corpus in memory.
+
+    Bucket counts, exact dedup (norm_hash index), near-dedup candidates
+    (LSH band keys in lsh_bands), crawled-URL checks and progress are all
+    indexed lookups; only the 90 bucket counts are cached in memory. Writes
+    go into one WAL transaction per checkpoint.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS blessings (
+            id INTEGER PRIMARY KEY,
+            relationship TEXT NOT NULL,
+            style TEXT NOT NULL,
+            length TEXT NOT NULL,
+            text TEXT NOT NULL,
+            normalized TEXT NOT NULL,
+            norm_hash INTEGER NOT NULL,
+            char_count INTEGER NOT NULL,
+            source_id INTEGER REFERENCES sources(id),
+            added_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS blessings_bucket ON blessings (relationship, style, length);
+        CREATE INDEX IF NOT EXISTS blessings_norm_hash ON blessings (norm_hash);
+        CREATE TABLE IF NOT EXISTS lsh_bands (
+            band_key INTEGER NOT NULL,
+            blessing_id INTEGER NOT NULL REFERENCES blessings(id)
+        );
+        CREATE INDEX IF NOT EXISTS lsh_bands_key ON lsh_bands (band_key);
+        CREATE TABLE IF NOT EXISTS urls (
+            url TEXT NOT NULL,
+            combo TEXT NOT NULL,
+            content_sha1 TEXT,
+            candidates INTEGER NOT NULL DEFAULT 0,
+            accepted INTEGER NOT NULL DEFAULT 0,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (url, combo)
+        );
+        CREATE TABLE IF NOT EXISTS progress (
+            combo TEXT PRIMARY KEY,
+            done INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path = CORPUS_DB_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._counts: dict[tuple[str, str, str], int] = {}
+        self._load_counts()
+
+    def _load_counts(self):
+        rows = self.conn.execute(
+            "SELECT relationship, style, length, COUNT(*) FROM blessings "
+            "GROUP BY relationship, style, length")
+        self._counts = {(rel, style, length): n for rel, style, length, n in rows}
+
+    def load(self):
+        print(f"Opened {self.path}: {sum(self._counts.values())} blessings")
+
+    def start_run(self, resume: bool):
+        """Clear the tables for a fresh run; import an older blessings.json on first resume."""
+        if not resume:
+            self.conn.executescript(
+                "DELETE FROM lsh_bands; DELETE FROM blessings; DELETE FROM sources; "
+                "DELETE FROM urls; DELETE FROM progress;")
+            self._counts = {}
+        elif not self._counts and OUTPUT_FILE.exists():
+            for rel, style, length, item in _iter_output_file():
+                norm = normalize_text(item["text"])
+                if not self.has_exact(norm):
+                    self.add(rel, style, length, item, norm, minhash_signature(norm))
+            print(f"Imported {sum(self._counts.values())} blessings from {OUTPUT_FILE}")
+        self.conn.commit()
+
+    def load_progress(self) -> dict[str, bool]:
+        return {combo: bool(done) for combo, done in self.conn.execute("SELECT combo, done FROM progress")}
+
+    def save_progress(self, progress: dict[str, bool]):
+        self.conn.executemany("INSERT OR REPLACE INTO progress (combo, done) VALUES (?, ?)",
+                              [(combo, int(done)) for combo, done in progress.items()])
+        self.conn.commit()
+
+    def count(self, rel: str, style: str, length: str) -> int:
+        return self._counts.get((rel, style, length), 0)
+
+    def counts(self) -> dict[tuple[str, str, str], int]:
+        return dict(self._counts)
+
+    def has_exact(self, normalized: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM blessings WHERE norm_hash = ? AND normalized = ? LIMIT 1",
+            (normalized_hash(normalized), normalized)).fetchone()
+        return row is not None
+
+    # Band rows are written for every blessing, so callers always need a signature
+    needs_signature = True
+
+    def find_similar(self, normalized: str, signature, threshold_for) -> bool:
+        keys = lsh_band_keys(signature)
+        rows = self.conn.execute(
+            "SELECT DISTINCT b.id, b.normalized, b.relationship, b.style, b.length "
+            "FROM lsh_bands l JOIN blessings b ON b.id = l.blessing_id "
+            f"WHERE l.band_key IN ({','.join('?' * len(keys))}) ORDER BY b.id", keys)
+        for _, other, rel, style, length in rows:
+            if ratio_exceeds(normalized, other, threshold_for((rel, style, length))):
+                return True
+        return False
+
+    def _source_id(self, url: str) -> int:
+        self.conn.execute("INSERT OR IGNORE INTO sources (url) VALUES (?)", (url,))
+        return self.conn.execute("SELECT id FROM sources WHERE url = ?", (url,)).fetchone()[0]
+
+    def add(self, rel: str, style: str, length: str, item: dict, normalized: str, signature):
+        cur = self.conn.execute(
+            "INSERT INTO blessings (relationship, style, length, text, normalized, norm_hash, "
+            "char_count, source_id, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel, style, length, item["text"], normalized, normalized_hash(normalized),
+             item["char_count"], self._source_id(item.get("source_url", "")), time.time()))
+        self.conn.executemany("INSERT INTO lsh_bands (band_key, blessing_id) VALUES (?, ?)",
+                              [(key, cur.lastrowid) for key in lsh_band_keys(signature)])
+        key = (rel, style, length)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def entries(self):
+        """Yield (rel, style, length, item) in insertion order."""
+        rows = self.conn.execute(
+            "SELECT b.relationship, b.style, b.length, b.text, b.char_count, s.url "
+            "FROM blessings b LEFT JOIN sources s ON s.id = b.source_id ORDER BY b.id")
+        for rel, style, length, text, char_count, url in rows:
+            yield rel, style, length, {"text": text, "char_count": char_count, "source_url": url}
+
+    def bucket_entries(self, rel: str, style: str, length: str):
+        """Yield the items of one bucket in insertion order (via the blessings_bucket index)."""
+        rows = self.conn.execute(
+            "SELECT b.text, b.char_count, s.url FROM blessings b "
+            "LEFT JOIN sources s ON s.id = b.source_id "
+            "WHERE b.relationship = ? AND b.style = ? AND b.length = ? ORDER BY b.id",
+            (rel, style, length))
+        for text, char_count, url in rows:
+            yield {"text": text, "char_count": char_count, "source_url": url}
+
+    def record_url(self, url: str, combo: str, content_sha1: str,
+                   candidates: int, accepted: int):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO urls (url, combo, content_sha1, candidates, accepted, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, combo, content_sha1, candidates, accepted, time.time()))
+
+    def is_crawled(self, url: str, combo: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM urls WHERE url = ? AND combo = ?",
+                                (url, combo)).fetchone()
+        return row is not None
+
+    def checkpoint(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Sharded export (manifest + content-hashed bucket files)
+# ---------------------------------------------------------------------------
+
+
+def compact_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """atomic_write_json for an already serialized body."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def precompress(data: bytes) -> dict[str, bytes]:
+    """gzip (and brotli, if installed) variants of data, where smaller than data."""
+    variants = {"gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {ext: body for ext, body in variants.items() if len(body) < len(data)}
+
+
+def _shard_items(items: list[dict]) -> list[dict]:
+    return [{field: item[field] for field in EXPORT_FIELDS if field in item} for item in items]
+
+
+def iter_buckets(blessings: dict):
+    """(rel, style, length, items) for a rel -> style -> length -> [item] mapping."""
+    for rel, styles in blessings.items():
+        for style, lengths in styles.items():
+            for length, items in lengths.items():
+                yield rel, style, length, items
+
+
+def export_shards(buckets, out_dir: Path = EXPORT_DIR, shard: str = "bucket",
+                  metadata: dict | None = None) -> dict:
+    """Write (rel, style, length, items) buckets as a manifest plus shard files.
+
+    buckets is iterated once, grouped by relationship (see iter_buckets and
+    BlessingScraper._buckets), so only one shard is held in memory.
+
+    shard="bucket" writes one list of items per non-empty rel/style/length
+    bucket, keyed "rel/style/length"; shard="relationship" writes one
+    style -> length -> [item] object per relationship. The manifest holds
+    every bucket's count, so a client can pick its fallback bucket before
+    fetching anything, and each shard's file name and byte sizes.
+
+    File names change with their content, so shards can be cached forever
+    and only the manifest needs revalidating. The manifest is replaced last;
+    shards referenced by neither it nor the previous one are removed.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / EXPORT_MANIFEST
+    previous = {}
+    if manifest_path.exists():
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("files", {})
+        except ValueError:
+            pass
+
+    counts = {}
+    files = {}
+
+    def shards():
+        """(key, data) per shard, built as buckets stream in."""
+        pending = None  # relationship shard being filled: (rel, style -> length -> items)
+        for rel, style, length, items in buckets:
+            counts.setdefault(rel, {}).setdefault(style, {})[length] = len(items)
+            if shard != "relationship":
+                if items:
+                    yield f"{rel}/{style}/{length}", _shard_items(items)
+                continue
+            if pending is not None and pending[0] != rel:
+                yield pending
+                pending = None
+            if pending is None:
+                pending = (rel, {})
+            pending[1].setdefault(style, {})[length] = _shard_items(items)
+        if pending is not None:
+            yield pending
+
+    for key, data in shards():
+        if shard == "relationship" and not any(items for lengths in data.values()
+                                               for items in lengths.values()):
+            continue
+        body = compact_json(data)
+        name = f"{key.replace('/', '.')}.{hashlib.sha1(body).hexdigest()[:EXPORT_HASH_CHARS]}.json"
+        path = out_dir / name
+        entry = {"file": name, "bytes": len(body)}
+        if path.exists():
+            # Same name, same content: only the variant sizes are needed
+            for ext in ("gz", "br"):
+                variant = out_dir / f"{name}.{ext}"
+                if variant.exists():
+                    entry[ext] = variant.stat().st_size
+        else:
+            for ext, variant in precompress(body).items():
+                atomic_write_bytes(out_dir / f"{name}.{ext}", variant)
+                entry[ext] = len(variant)
+            atomic_write_bytes(path, body)
+        files[key] = entry
+
+    metadata = metadata or {}
+    manifest = {
+        "version": 1,
+        "generated_at": datetime.now().isoformat(),
+        "total_count": sum(n for styles in counts.values() for lengths in styles.values()
+                           for n in lengths.values()),
+        "shard": shard,
+        "fields": list(EXPORT_FIELDS),
+        "categories": metadata.get("categories") or {"relationships": REL_LABELS,
+                                                      "styles": STYLE_LABELS},
+        "counts": counts,
+        "files": files,
+    }
+    atomic_write_json(manifest_path, manifest, separators=(",", ":"))
+
+    keep = {EXPORT_MANIFEST}
+    for entry in [*files.values(), *previous.values()]:
+        keep.update((entry["file"], f"{entry['file']}.gz", f"{entry['file']}.br"))
+    for path in out_dir.iterdir():
+        if path.name not in keep and EXPORT_SHARD_RE.match(path.name):
+            path.unlink()
+
+    shard_bytes = sum(entry["bytes"] for entry in files.values())
+    gz_bytes = sum(entry.get("gz", entry["bytes"]) for entry in files.values())
+    largest = max((entry["bytes"] for entry in files.values()), default=0)
+    print(f"Exported {manifest['total_count']} blessings to {out_dir}: manifest "
+          f"{manifest_path.stat().st_size / 1024:.1f} KB, {len(files)} shards "
+          f"{shard_bytes / 1024:.1f} KB ({gz_bytes / 1024:.1f} KB gzipped), "
+          f"largest {largest / 1024:.1f} KB")
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Main scraping logic
+# ---------------------------------------------------------------------------
+
+
+class BlessingScraper:
+    def __init__(self, resume: bool = False, workers: int = 1,
+                 dedup_threshold: float = GLOBAL_SIMILARITY_THRESHOLD,
+                 cache: ResponseCache | None = None,
+                 archive: PageArchive | None = None,
+                 extractor: str = DEFAULT_EXTRACTOR,
+                 store: MemoryCorpus | SqliteCorpus | None = None,
+                 target: int = TARGET_PER_BUCKET,
+                 frontier: UrlFrontier | None = None,
+                 shared_pool: bool = False,
+                 scheduler: QueryScheduler | None = None,
+                 max_requests: int | None = None,
+                 governor: RateGovernor | None = None,
+                 session: requests.Session | None = None,
+                 max_page_bytes: int = PAGE_MAX_BYTES,
+                 cpu_workers: int = 0,
+                 serp_cache: SerpCache | None = None,
+                 redirects: RedirectCache | None = None):
+        # Extraction processes are forked before any fetch thread exists
+        self.cpu_workers = cpu_workers
+        self.cpu_pool = (multiprocessing.Pool(cpu_workers, initializer=_init_extraction_worker)
+                         if cpu_workers > 0 else None)
+        # Fetch threads plus the main thread's search requests share the pool
+        self.session = session or create_session(pool_size=workers + 1)
+        self.cache = cache
+        self.archive = archive
+        self.extractor = extractor
+        # Sogou link -> article resolutions; in-memory for this run unless given one
+        self.fetcher = PageFetcher(self.session, workers=workers, cache=cache,
+                                   max_bytes=max_page_bytes, redirects=redirects)
+        self.store = store or MemoryCorpus(dedup_threshold=dedup_threshold)
+        self.dedup_threshold = dedup_threshold
+        self.target = target
+        self.frontier = frontier
+        # Shared-pool mode: every page's candidates are classified once and
+        # placed in whichever buckets have room, not just the current combo's
+        self.shared_pool = shared_pool
+        # Adaptive Phase 2 (see _scrape_adaptive) instead of the fixed combo loop
+        self.scheduler = scheduler
+        self.max_requests = max_requests
+        self.search_requests = 0
+        # Parsed search result pages reused across runs (None: always search)
+        self.serp_cache = serp_cache
+        # Per-stage timings and per-host/per-query stats, written to METRICS_FILE
+        self.metrics = METRICS
+        # Search engine pacing / circuit breaker; in-memory unless given one
+        self.governor = governor or RateGovernor(path=None)
+        # Pages extracted this run, shared by every combo that wants them
+        self._pages: OrderedDict[str, FetchedPage] = OrderedDict()
+        self._failed: set[str] = set()
+        self.page_counts = {"fetched": 0, "failed": 0, "shared": 0, "skipped": 0,
+                            "redirects": 0, "aliases": 0}
+        self.progress: dict[str, bool] = {}
+        self.resume = resume
 
         if resume:
             self._load_progress()
 
     def _load_progress(self):
         """Load progress and existing data for resume mode."""
-        if PROGRESS_FILE.exists():
-            with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-                self.progress = json.load(f)
+        self.progress = self.store.load_progress()
+        if self.progress:
             print(f"Loaded progress: {sum(v for v in self.progress.values() if v)} combinations completed")
-
-        if OUTPUT_FILE.exists():
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if "blessings" in data:
-                for rel in RELATIONSHIPS:
-                    if rel not in data["blessings"]:
-                        continue
-                    for style in STYLES:
-                        if style not in data["blessings"][rel]:
-                            continue
-                        for length in LENGTHS:
-                            if length not in data["blessings"][rel][style]:
-                                continue
-                            items = data["blessings"][rel][style][length]
-                            self.blessings[rel][style][length] = items
-                            for item in items:
-                                self.normalized_set.add(normalize_text(item["text"]))
-            print(f"Loaded {len(self.normalized_set)} existing blessings")
+        self.store.load()
 
     def _save_progress(self):
-        """Save current progress to disk."""
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.progress, f, ensure_ascii=False, indent=2)
+        """Checkpoint the store and save progress."""
+        with self.metrics.stage("save"):
+            self._write_progress()
+
+    def _write_progress(self):
+        self.store.save_progress(self.progress)
+        if self.frontier is not None:
+            self.frontier.save()
+        if self.scheduler is not None:
+            self.scheduler.stats.save()
+        if self.serp_cache is not None:
+            self.serp_cache.save()
+        self.fetcher.redirects.save()
+
+    def close(self):
+        self.fetcher.close()
+        if self.cpu_pool is not None:
+            self.cpu_pool.terminate()
+            self.cpu_pool.join()
+        self.store.close()
+        if self.frontier is not None:
+            self.frontier.save()
+        if self.scheduler is not None:
+            self.scheduler.stats.save()
+        if self.serp_cache is not None:
+            self.serp_cache.save()
+        self.fetcher.redirects.save()
+        self.governor.save()
+
+    def _plan_urls(self, urls: list[str]) -> list[str]:
+        """Put new urls before processed ones and drop pages not worth (re)fetching.
+
+        A page that already failed this run is never retried in the same run.
+        """
+        if self.frontier is not None:
+            urls = self.frontier.order(urls)
+        planned = []
+        for url in urls:
+            if url in self._failed or (self.frontier is not None and url not in self._pages
+                                       and self.frontier.skip_reason(url)):
+                self.page_counts["skipped"] += 1
+            else:
+                planned.append(url)
+        if len(planned) < len(urls):
+            print(f"  Skipping {len(urls) - len(planned)} failing/empty pages")
+        return planned
+
+    def _iter_pages(self, urls: list[str], delay: tuple[float, float] | None = None):
+        """Yield (url, FetchedPage | None) in order.
+
+        Pages already extracted this run are shared from memory (html=None);
+        only the rest go to the fetcher, and each is extracted once.
+        """
+        urls = list(dict.fromkeys(urls))
+        known = {url: self._pages[url] for url in urls if url in self._pages}
+        fetched = self.fetcher.fetch_many([url for url in urls if url not in known], delay=delay)
+        extracted = self._extract_pages(fetched)
+        offline = self.cache is not None and self.cache.offline
+        try:
+            for url in urls:
+                page = known.get(url)
+                if page is not None:
+                    if url in self._pages:
+                        self._pages.move_to_end(url)
+                    self.page_counts["shared"] += 1
+                    yield url, page
+                    continue
+
+                _, page = next(extracted)
+                if page is None:
+                    self.page_counts["failed"] += 1
+                    self._failed.add(url)
+                    if self.frontier is not None and not offline:
+                        self.frontier.record_fetch(url, None)
+                    yield url, None
+                    continue
+                self.page_counts["fetched"] += 1
+                if self.frontier is not None:
+                    self.frontier.record_fetch(url, page.sha1)
+                self._pages[url] = page._replace(html=None)
+                if len(self._pages) > PAGE_MEMO_SIZE:
+                    self._pages.popitem(last=False)
+                yield url, page
+        finally:
+            extracted.close()
+            fetched.close()
+
+    def _extract_pages(self, fetched):
+        """Turn the fetcher's (url, html) stream into (url, FetchedPage | None).
+
+        Inline by default. With a CPU pool (--cpu-workers) this is the middle
+        stage of the pipeline: fetch threads -> extraction processes -> this
+        (single) writer thread, with at most CPU_QUEUE_DEPTH pages per process
+        queued, so a busy writer stalls extraction and extraction stalls fetching.
+        """
+        if self.cpu_pool is None:
+            for url, html in fetched:
+                yield url, None if html is None else extract_fetched_page(
+                    html, self.extractor, self.shared_pool)
+            return
+        jobs = ((url, html, self.extractor, self.shared_pool) for url, html in fetched)
+        window = self.cpu_workers * CPU_QUEUE_DEPTH
+        for (url, html, _, _), (page, stages) in bounded_imap(self.cpu_pool, _extract_fetched_job,
+                                                               jobs, window):
+            self.metrics.merge_stages(stages)
+            yield url, None if page is None else page._replace(html=html)
+
+    def _record_page(self, url: str, page: FetchedPage, combo: str, added: int):
+        self.metrics.page(url, added)
+        self.store.record_url(url, combo, page.sha1, len(page.candidates), added)
+        if self.frontier is not None:
+            self.frontier.record_yield(url, len(page.candidates), added)
 
     def _save_output(self):
-        """Save blessings data to output JSON."""
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        """Compact the corpus into blessings.json (atomic rename)."""
+        with self.metrics.stage("save"):
+            self._write_output()
 
-        stats = {}
-        total = 0
+    def _buckets(self):
+        """Yield (rel, style, length, items) for every bucket, one bucket in memory at a time."""
+        self.store.checkpoint()
         for rel in RELATIONSHIPS:
-            stats[rel] = {}
             for style in STYLES:
-                stats[rel][style] = {}
                 for length in LENGTHS:
-                    count = len(self.blessings[rel][style][length])
-                    stats[rel][style][length] = count
-                    total += count
-
-        output = {
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "total_count": total,
-            },
-            "blessings": self.blessings,
-            "stats": stats,
+                    yield rel, style, length, list(self.store.bucket_entries(rel, style, length))
+
+    def _write_output(self):
+        """Stream blessings.json bucket by bucket, in the same layout as json.dump(indent=2)."""
+        counts = self.store.counts()
+        stats = {rel: {style: {length: counts.get((rel, style, length), 0) for length in LENGTHS}
+                       for style in STYLES}
+                 for rel in RELATIONSHIPS}
+        total = sum(counts.values())
+        metadata = {
+            "generated_at": datetime.now().isoformat(),
+            "total_count": total,
         }
 
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
+        def nested(value, depth: int) -> str:
+            return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + "  " * depth)
+
+        def chunks():
+            yield '{\n  "metadata": ' + nested(metadata, 1) + ',\n  "blessings": {'
+            last = None
+            for rel, style, length, items in self._buckets():
+                if last is None or rel != last[0]:
+                    if last is not None:
+                        yield "\n      }\n    },"
+                    yield f"\n    {json.dumps(rel)}: {{\n      {json.dumps(style)}: {{"
+                elif style != last[1]:
+                    yield f"\n      }},\n      {json.dumps(style)}: {{"
+                else:
+                    yield ","
+                yield f"\n        {json.dumps(length)}: " + nested(items, 4)
+                last = (rel, style)
+            yield '\n      }\n    }\n  },\n  "stats": ' + nested(stats, 1) + "\n}"
+
+        atomic_write_text(OUTPUT_FILE, chunks())
 
         print(f"\nSaved {total} blessings to {OUTPUT_FILE}")
 
+    def export(self, out_dir: Path = EXPORT_DIR, shard: str = "bucket") -> dict:
+        """Shard the corpus for lazy loading by the app (see export_shards)."""
+        with self.metrics.stage("save"):
+            return export_shards(self._buckets(), out_dir, shard)
+
     def _add_blessing(self, text: str, rel: str, style: str, source_url: str) -> int:
         """Add a blessing, classifying by length. Returns 0 or 1."""
+        started = time.perf_counter()
         text = clean_blessing_text(text)
-        if not filter_blessing(text):
+        passed = filter_blessing(text)
+        self.metrics.observe("filter", time.perf_counter() - started)
+        if not passed:
             return 0
 
         cc = count_chinese_chars(text)
@@ -651,44 +3753,68 @@ class BlessingScraper:
         if length_id is None:
             return 0
 
-        bucket = self.blessings[rel][style][length_id]
-
-        if len(bucket) >= TARGET_PER_BUCKET:
-            return 0
-
-        # Exact dedup
-        norm = normalize_text(text)
-        if norm in self.normalized_set:
+        if self.store.count(rel, style, length_id) >= self.target:
             return 0
 
-        # Near-dedup against same bucket
-        existing_texts = [item["text"] for item in bucket]
-        if is_similar(text, existing_texts):
+        with self.metrics.stage("dedup"):
+            norm, signature = self._find_duplicate(text, rel, style, length_id)
+        if norm is None:
+            self.metrics.count("duplicates")
             return 0
 
-        bucket.append({
+        item = {
             "text": text,
             "char_count": cc,
             "source_url": source_url,
-        })
-        self.normalized_set.add(norm)
+        }
+        self.store.add(rel, style, length_id, item, norm, signature)
         return 1
 
+    def _find_duplicate(self, text: str, rel: str, style: str, length_id: str):
+        """(norm, signature) for a new text, or (None, None) if it duplicates a stored one."""
+        # Exact dedup
+        norm = normalize_text(text)
+        if self.store.has_exact(norm):
+            return None, None
+
+        # Near-dedup across the whole corpus; the same bucket keeps the
+        # original SIMILARITY_THRESHOLD, other buckets use the global one
+        bucket_key = (rel, style, length_id)
+
+        def threshold_for(tag):
+            return SIMILARITY_THRESHOLD if tag == bucket_key else self.dedup_threshold
+
+        signature = minhash_signature(norm) if self.store.needs_signature else None
+        if self.store.find_similar(norm, signature, threshold_for):
+            return None, None
+        return norm, signature
+
     def _add_blessing_auto_classify(self, text: str, source_url: str,
                                      hint_rel: str | None = None,
                                      hint_style: str | None = None) -> int:
         """Add a blessing with auto-detected relationship and style.
         hint_rel/hint_style provide fallback classification if detection fails."""
+        started = time.perf_counter()
         text = clean_blessing_text(text)
-        if not filter_blessing(text):
+        passed = filter_blessing(text)
+        filtered = time.perf_counter()
+        self.metrics.observe("filter", filtered - started)
+        if not passed:
             return 0
 
+        rel, style = detect_relationship(text), detect_style(text)
+        self.metrics.observe("classify", time.perf_counter() - filtered)
+        return self._add_detected(text, rel, style, source_url, hint_rel, hint_style)
+
+    def _add_detected(self, text: str, rel: str | None, style: str | None, source_url: str,
+                      hint_rel: str | None = None, hint_style: str | None = None) -> int:
+        """Add a cleaned, filtered text whose rel/style detection already ran."""
         # Detect or use hint
-        rel = detect_relationship(text) or hint_rel
+        rel = rel or hint_rel
         if rel is None:
             return 0
 
-        style = detect_style(text) or hint_style
+        style = style or hint_style
         if style is None:
             # Default assignment based on text characteristics
             style = "formal"  # safest default
@@ -701,58 +3827,190 @@ class BlessingScraper:
     def _is_combo_done(self, rel: str, style: str) -> bool:
         """Check if all three length buckets for this combo are full."""
         return all(
-            len(self.blessings[rel][style][length]) >= TARGET_PER_BUCKET
+            self.store.count(rel, style, length) >= self.target
             for length in LENGTHS
         )
 
     def _scrape_page_for_combo(self, url: str, rel: str, style: str) -> int:
-        """Fetch and extract blessings from one URL for a specific combo."""
-        html = fetch_page(self.session, url)
-        if html is None:
+        """Fetch (or reuse) one URL and add its blessings to a specific combo."""
+        if self.store.is_crawled(url, self._combo_key(rel, style)):
             return 0
-
-        candidates = extract_blessings_from_html(html)
         added = 0
-        for text in candidates:
-            added += self._add_blessing(text, rel, style, url)
+        for url, page in self._iter_pages(self._plan_urls([url])):
+            added += self._add_page_for_combo(url, page, rel, style)
+        return added
+
+    def _add_page_for_combo(self, url: str, page: FetchedPage | None, rel: str, style: str) -> int:
+        """Add an already extracted page's candidates to a specific combo."""
+        if page is None:
+            return 0
+        if self.archive is not None:
+            self.archive.record(url, page.html, rel, style, sha1=page.sha1)
+
+        if self.shared_pool:
+            added = self._add_page_pooled(url, page, rel, style)
+        else:
+            added = 0
+            for text in page.candidates:
+                added += self._add_blessing(text, rel, style, url)
+        self._record_page(url, page, self._combo_key(rel, style), added)
         return added
 
+    def _add_page_pooled(self, url: str, page: FetchedPage, rel: str, style: str) -> int:
+        """Distribute a page's classified candidates over all buckets with room."""
+        here = elsewhere = 0
+        for _, text, det_rel, det_style in page.classified:
+            placed = self._add_pooled(text, det_rel, det_style, url, rel, style)
+            if placed == (rel, style):
+                here += 1
+            elif placed is not None:
+                elsewhere += 1
+        if elsewhere:
+            print(f"    pool: +{here} here, +{elsewhere} to other combos")
+        return here + elsewhere
+
+    def _add_pooled(self, text: str, det_rel: str | None, det_style: str | None, source_url: str,
+                    hint_rel: str, hint_style: str) -> tuple[str, str] | None:
+        """Place one classified candidate; returns the (rel, style) it went to, or None.
+
+        The detected combo comes first (gaps filled from the query hint, as
+        _add_detected does); if that bucket is full the candidate falls back
+        to the hint combo, which is where combo mode would have put it.
+        """
+        targets = [(det_rel or hint_rel, det_style or hint_style)]
+        if targets[0] != (hint_rel, hint_style):
+            targets.append((hint_rel, hint_style))
+        for rel, style in targets:
+            if self._add_blessing(text, rel, style, source_url):
+                return rel, style
+        return None
+
     def _search_and_scrape(self, queries: list[str], rel: str, style: str,
                            engine: str = "weixin") -> int:
         """Run search queries and scrape resulting pages."""
+        if self.cache is not None and self.cache.offline:
+            print(f"  [OFFLINE] Skipping {engine} search in --cached-only mode")
+            return 0
+
         all_urls = []
         for q in queries:
+            if not self.governor.available(engine) and self._cached_search_page(engine, q, 1) is None:
+                print(f"  [COOLDOWN] {engine} paused for another "
+                      f"{self.governor.seconds_until_available([engine]):.0f}s, skipping its queries")
+                break
             print(f"  Searching ({engine}): {q}")
-            if engine == "weixin":
-                urls = weixin_sogou_search_urls(self.session, q, pages=3)
-            else:
-                urls = sogou_search_urls(self.session, q, pages=2)
+            urls = self._search_urls(engine, q, pages=3 if engine == "weixin" else 2)
             all_urls.extend(urls)
             print(f"    Found {len(urls)} URLs")
 
-        # Deduplicate
-        seen = set()
-        unique_urls = []
-        for url in all_urls:
-            if url not in seen:
-                seen.add(url)
-                unique_urls.append(url)
+        return self._crawl_urls(all_urls, rel, style)
 
-        print(f"  Unique URLs to crawl: {len(unique_urls)}")
+    def _search_urls(self, engine: str, query: str, pages: int) -> list[str]:
+        """Result URLs from the first pages of a query; cached pages cost no request.
 
+        Stops at the first uncached page while the engine's circuit is open.
+        """
+        urls = []
+        for page in range(1, pages + 1):
+            found = self._cached_search_page(engine, query, page)
+            if found is None:
+                if not self.governor.available(engine):
+                    break
+                found = self._search_page(engine, query, page)
+            if found:
+                urls.extend(found)
+        return urls
+
+    def _cached_search_page(self, engine: str, query: str, page: int,
+                            merge_synonyms: bool = True) -> list[str] | None:
+        if self.serp_cache is None:
+            return None
+        urls = self.serp_cache.get(engine, query, page, merge_synonyms)
+        if urls is not None:
+            self.metrics.count("serp_cache_hits")
+            self.metrics.query(engine, query, 0, urls)
+        return urls
+
+    def _search_page(self, engine: str, query: str, page: int,
+                     merge_synonyms: bool = True) -> list[str] | None:
+        """Request one result page from the engine and cache its parsed links."""
+        page_fn, _ = SEARCH_ENGINES[engine]
+        urls = page_fn(self.session, query, page, self.governor)
+        self.search_requests += 1
+        self.metrics.query(engine, query, 1, urls or [])
+        if urls is not None and self.serp_cache is not None:
+            self.serp_cache.put(engine, query, page, urls, merge_synonyms)
+        return urls
+
+    def _article_urls(self, urls: list[str], seen: set[str]) -> list[str]:
+        """Canonical article URLs for a window of search results, minus those in seen.
+
+        Sogou links are resolved here, just before the window is fetched, so
+        the redirect links and share variants of one article collapse to a
+        single URL: it is fetched once per run and recognised as crawled
+        later on. New URLs are added to seen.
+        """
+        offline = self.cache is not None and self.cache.offline
+        if not offline:
+            self.page_counts["redirects"] += sum(
+                1 for url in urls if is_sogou_link(url) and self.fetcher.redirects.get(url) is None)
+        resolved = self.fetcher.resolve_many(urls)
+        self.metrics.alias(urls, resolved)
+        articles = []
+        for url in resolved:
+            if url is not None and url not in seen:
+                seen.add(url)
+                articles.append(url)
+        unresolved = resolved.count(None)
+        aliases = len(urls) - unresolved - len(articles)
+        self.page_counts["aliases"] += aliases
+        if unresolved:
+            print(f"  [WARN] {unresolved} Sogou links could not be resolved")
+        if aliases:
+            print(f"  {aliases} results were repeats of the same articles")
+        return articles
+
+    def _crawl_urls(self, all_urls: list[str], rel: str, style: str) -> int:
+        """Crawl search result URLs for a combo until its buckets are full."""
         added_total = 0
-        for i, url in enumerate(unique_urls):
-            if self._is_combo_done(rel, style):
-                print(f"  [FULL] All buckets filled, stopping early")
-                break
-
-            print(f"  [{i+1}/{len(unique_urls)}] {url[:80]}...")
-            added = self._scrape_page_for_combo(url, rel, style)
-            if added > 0:
-                print(f"    +{added}")
-            added_total += added
-            random_delay(1, 3)
+        if self._is_combo_done(rel, style):
+            return added_total
 
+        # Resolve, deduplicate by article and drop pages already crawled for
+        # this combo one window at a time, so an early stop saves the redirects too
+        key = self._combo_key(rel, style)
+        results = list(dict.fromkeys(all_urls))
+        window = max(RESOLVE_AHEAD, 2 * self.fetcher.workers)
+        seen: set[str] = set()
+        crawled = skipped = 0
+        print(f"  Search results to crawl: {len(results)}")
+
+        for start in range(0, len(results), window):
+            urls = []
+            for url in self._article_urls(results[start:start + window], seen):
+                if self.store.is_crawled(url, key):
+                    skipped += 1
+                else:
+                    urls.append(url)
+            pages = self._iter_pages(self._plan_urls(urls))
+            try:
+                for url, page in pages:
+                    crawled += 1
+                    print(f"  [{crawled}] {url[:80]}...")
+                    added = self._add_page_for_combo(url, page, rel, style)
+                    if added > 0:
+                        print(f"    +{added}")
+                    added_total += added
+
+                    if self._is_combo_done(rel, style):
+                        print(f"  [FULL] All buckets filled, stopping early"
+                              + (f" ({skipped} already crawled)" if skipped else ""))
+                        return added_total
+            finally:
+                pages.close()
+
+        if skipped:
+            print(f"  {skipped} results already crawled for this combo")
         return added_total
 
     def _scrape_seeds_bulk(self):
@@ -766,18 +4024,20 @@ class BlessingScraper:
             all_seed_urls.update(urls)
         all_seed_urls.update(WECHAT_SEED_URLS)
 
-        for i, url in enumerate(sorted(all_seed_urls)):
-            print(f"\n  [{i+1}/{len(all_seed_urls)}] {url[:80]}...")
-            html = fetch_page(self.session, url)
-            if html is None:
+        seed_urls = self._plan_urls([url for url in sorted(all_seed_urls)
+                                     if not self.store.is_crawled(url, "")])
+        for i, (url, page) in enumerate(self._iter_pages(seed_urls, delay=(1, 2))):
+            print(f"\n  [{i+1}/{len(seed_urls)}] {url[:80]}...")
+            if page is None:
                 continue
+            if self.archive is not None:
+                self.archive.record(url, page.html, sha1=page.sha1)
 
-            candidates = extract_blessings_from_html(html)
             added = 0
-            for text in candidates:
+            for text in page.candidates:
                 added += self._add_blessing_auto_classify(text, url)
-            print(f"    Extracted {len(candidates)} candidates, added {added}")
-            random_delay(1, 2)
+            self._record_page(url, page, "", added)
+            print(f"    Extracted {len(page.candidates)} candidates, added {added}")
 
         self._save_output()
         self._report_bucket_status("After Phase 1")
@@ -821,54 +4081,243 @@ class BlessingScraper:
 
         # Report status
         for length in LENGTHS:
-            count = len(self.blessings[rel][style][length])
-            status = "OK" if count >= TARGET_PER_BUCKET else f"{count}/{TARGET_PER_BUCKET}"
+            count = self.store.count(rel, style, length)
+            status = "OK" if count >= self.target else f"{count}/{self.target}"
             print(f"  {length}: {status}")
 
         if self._is_combo_done(rel, style):
             self.progress[key] = True
 
+        # Accepted blessings are already journaled; blessings.json is only
+        # compacted at phase boundaries instead of after every combo
         self._save_progress()
+
+    def reprocess(self, archive_path: Path = PAGE_ARCHIVE_FILE, processes: int | None = None):
+        """Rebuild the output from archived pages without any network access.
+
+        Distinct page bodies are extracted, cleaned, filtered and classified
+        on a process pool; results are applied through _add_blessing in
+        archive order, so the rebuild is deterministic.
+        """
+        if not archive_path.exists():
+            print(f"  [WARN] No page archive at {archive_path}, nothing to reprocess")
+            return
+        print(f"Reprocessing archived pages from {archive_path}")
+        # Close off a crashed run's member first: the corpus is only reset
+        # once every archived record is known to be readable
+        PageArchive.repair(archive_path)
+        started = time.time()
+        self.metrics.reset()
+        self.store.start_run(self.resume)
+        records = deque()
+
+        def _jobs():
+            for rec in PageArchive.iter_records(archive_path):
+                records.append(rec)
+                yield rec["sha1"], rec.get("html"), self.extractor
+
+        extracted: dict[str, list] = {}
+        pages = added = 0
+        window = (processes or os.cpu_count() or 1) * CPU_QUEUE_DEPTH
+        with multiprocessing.Pool(processes, initializer=_init_extraction_worker) as pool:
+            for _, (sha1, candidates, stages) in bounded_imap(pool, _extract_archived_page, _jobs(), window):
+                self.metrics.merge_stages(stages)
+                rec = records.popleft()
+                if candidates is not None:
+                    extracted[sha1] = candidates
+                candidates = extracted.get(sha1)
+                if candidates is None:
+                    continue
+                pages += 1
+                rel, style = rec.get("rel"), rec.get("style")
+                for raw, text, det_rel, det_style in candidates:
+                    if rel is None:
+                        added += self._add_detected(text, det_rel, det_style, rec["url"])
+                    elif self.shared_pool:
+                        added += self._add_pooled(text, det_rel, det_style, rec["url"],
+                                                  rel, style) is not None
+                    else:
+                        added += self._add_blessing(raw, rel, style, rec["url"])
+
+        print(f"Reprocessed {pages} page visits ({len(extracted)} distinct pages), "
+              f"added {added} blessings in {time.time() - started:.1f}s")
         self._save_output()
+        self.write_metrics()
+        self.print_stats()
+
+    def _requests_spent(self) -> int:
+        counts = self.page_counts
+        return self.search_requests + counts["redirects"] + counts["fetched"] + counts["failed"]
+
+    def _combo_counts(self, rel: str, style: str) -> dict[str, int]:
+        return {length: self.store.count(rel, style, length) for length in LENGTHS}
+
+    def _scrape_adaptive(self):
+        """Phase 2 driven by QueryScheduler instead of a fixed combo/query loop.
+
+        Repeatedly searches the emptiest combo with its most promising
+        untried query, one result page at a time, until every bucket is
+        full, every combo is exhausted, or --max-requests is spent.
+        """
+        if self.cache is not None and self.cache.offline:
+            print("  [OFFLINE] Skipping adaptive search in --cached-only mode")
+            return
+
+        tried: set[tuple[str, str]] = set()
+        idle: dict[tuple[str, str], int] = {}
+        exhausted: set[tuple[str, str]] = set()
+        # Combos whose remaining queries are all on a paused engine, until when
+        deferred: dict[tuple[str, str], float] = {}
+        accepted_start = sum(self.store.counts().values())
+        spent_start = self._requests_spent()
+
+        while True:
+            spent = self._requests_spent() - spent_start
+            if self.max_requests is not None and spent >= self.max_requests:
+                print(f"\n  [BUDGET] {spent} requests spent, stopping")
+                break
+            now = time.time()
+            open_combos = {(rel, style): self._combo_counts(rel, style)
+                           for rel in RELATIONSHIPS for style in STYLES
+                           if (rel, style) not in exhausted and deferred.get((rel, style), 0) <= now}
+            combo = self.scheduler.next_combo(open_combos)
+            if combo is None:
+                waiting = [until for until in deferred.values() if until > now]
+                if not waiting:
+                    break
+                # Everything left is waiting on a paused engine; only this sleeps
+                wait = min(waiting) - now
+                print(f"\n  [COOLDOWN] Remaining combos wait on paused engines, "
+                      f"sleeping {wait:.0f}s")
+                time.sleep(wait)
+                self.metrics.observe("backoff", wait)
+                continue
+            rel, style = combo
+            engines = [engine for engine in SEARCH_ENGINES if self.governor.available(engine)]
+            plan = self.scheduler.next_query(rel, style, open_combos[combo], tried, engines)
+            if plan is None:
+                paused = [engine for engine in SEARCH_ENGINES if engine not in engines]
+                if paused:
+                    deferred[combo] = now + self.governor.seconds_until_available(paused)
+                else:
+                    exhausted.add(combo)
+                continue
+            tried.add((plan.engine, plan.query))
+
+            print(f"\n--- {REL_LABELS[rel]}x{STYLE_LABELS[style]} "
+                  f"{open_combos[combo]} <- ({plan.engine}) {plan.query}")
+            before = sum(open_combos[combo].values())
+            self._run_query(plan, rel, style)
+            gained = sum(self._combo_counts(rel, style).values()) - before
+
+            idle[combo] = 0 if gained else idle.get(combo, 0) + 1
+            if idle[combo] >= SCHEDULER_MAX_IDLE:
+                print(f"  [EXHAUSTED] {self._combo_key(rel, style)}: "
+                      f"{SCHEDULER_MAX_IDLE} queries in a row added nothing")
+                exhausted.add(combo)
+            if self._is_combo_done(rel, style):
+                self.progress[self._combo_key(rel, style)] = True
+            self._save_progress()
+
+        spent = self._requests_spent() - spent_start
+        accepted = sum(self.store.counts().values()) - accepted_start
+        print(f"\n  Adaptive search: {len(tried)} queries, {spent} requests, {accepted} accepted"
+              + (f" ({spent / accepted:.1f} requests per blessing)" if accepted else ""))
+
+    def _run_query(self, plan: QueryPlan, rel: str, style: str):
+        """Run one query page by page, stopping when its marginal yield drops."""
+        _, max_pages = SEARCH_ENGINES[plan.engine]
+        seen: set[str] = set()
+        for page in range(1, max_pages + 1):
+            if not self.scheduler.page_worthwhile(plan.engine, page):
+                break
+            counts_before = self._combo_counts(rel, style)
+            total_before = sum(self.store.counts().values())
+            spent_before = self._requests_spent()
+
+            urls = self._cached_search_page(plan.engine, plan.query, page, merge_synonyms=False)
+            cached = urls is not None
+            if not cached:
+                if not self.governor.available(plan.engine):
+                    break
+                urls = self._search_page(plan.engine, plan.query, page, merge_synonyms=False)
+            if urls is not None:
+                urls = [url for url in urls if url not in seen]
+                seen.update(urls)
+                print(f"  page {page}: {len(urls)} URLs")
+                self._crawl_urls(urls, rel, style)
+
+            requests_used = self._requests_spent() - spent_before
+            accepted = sum(self.store.counts().values()) - total_before
+            gained = {length: n - counts_before[length]
+                      for length, n in self._combo_counts(rel, style).items()}
+            # Yield stats describe live traffic; a cached page cost no search
+            if not cached:
+                self.scheduler.stats.record(plan, page, requests_used, accepted, gained)
+
+            if not urls or self._is_combo_done(rel, style):
+                break
+            if requests_used and accepted / requests_used < SCHEDULER_MIN_YIELD:
+                print(f"  Marginal yield {accepted}/{requests_used} too low, not paginating further")
+                break
 
     def _report_bucket_status(self, label: str = ""):
         """Quick status report."""
-        total = sum(
-            len(self.blessings[r][s][l])
-            for r in RELATIONSHIPS for s in STYLES for l in LENGTHS
-        )
-        full = sum(
-            1 for r in RELATIONSHIPS for s in STYLES for l in LENGTHS
-            if len(self.blessings[r][s][l]) >= TARGET_PER_BUCKET
-        )
+        counts = self.store.counts()
+        total = sum(counts.values())
+        full = sum(1 for c in counts.values() if c >= self.target)
         print(f"\n  [{label}] Total: {total}, Full buckets: {full}/90")
 
     def scrape_all(self):
         """Run the full scraping pipeline."""
         print("Starting blessing scraper...")
-        print(f"Target: 90 buckets x {TARGET_PER_BUCKET} = {90 * TARGET_PER_BUCKET} blessings\n")
+        print(f"Target: 90 buckets x {self.target} = {90 * self.target} blessings\n")
+        self.metrics.reset()
+        self.store.start_run(self.resume)
 
         # Phase 1: Bulk scrape from seed URLs
         self._scrape_seeds_bulk()
 
         # Phase 2: Targeted search for each combo
         print("\n" + "=" * 60)
-        print("Phase 2: Targeted search per combo")
+        print("Phase 2: Targeted search per combo" + (" (adaptive)" if self.scheduler else ""))
         print("=" * 60)
 
-        total_combos = len(RELATIONSHIPS) * len(STYLES)
-        done = 0
-        for rel in RELATIONSHIPS:
-            for style in STYLES:
-                done += 1
-                print(f"\n{'='*40} [{done}/{total_combos}]")
-                self._scrape_combo(rel, style)
+        if self.scheduler is not None:
+            self._scrape_adaptive()
+        else:
+            total_combos = len(RELATIONSHIPS) * len(STYLES)
+            done = 0
+            for rel in RELATIONSHIPS:
+                for style in STYLES:
+                    done += 1
+                    print(f"\n{'='*40} [{done}/{total_combos}]")
+                    self._scrape_combo(rel, style)
 
         self._save_output()
         print(f"\n{'='*60}")
         print("Scraping complete!")
+        counts = self.page_counts
+        print(f"Requests: {self.search_requests} searches + {counts['redirects']} redirects + "
+              f"{counts['fetched'] + counts['failed']} pages; "
+              f"pages: {counts['fetched']} fetched, {counts['failed']} failed, "
+              f"{counts['shared']} reused within the run, {counts['skipped']} skipped as failing or empty, "
+              f"{counts['aliases']} repeated results of the same article")
+        print(f"Transfer: {self.fetcher.stats.summary()}")
+        self.write_metrics()
         self.print_stats()
 
+    def write_metrics(self, path: Path = METRICS_FILE):
+        """Write the run's METRICS report, with request and transfer counts, as JSON."""
+        report = self.metrics.report()
+        report["search_requests"] = self.search_requests
+        report["pages"] = dict(self.page_counts)
+        report["transfer"] = self.fetcher.stats.to_dict()
+        atomic_write_json(path, report, indent=2)
+        busiest = sorted(report["stages"].items(), key=lambda kv: -kv[1]["total_s"])[:6]
+        print("Time by stage: " + ", ".join(f"{name} {data['total_s']:.1f}s" for name, data in busiest))
+        print(f"Metrics written to {path}")
+
     def print_stats(self):
         """Print coverage statistics."""
         print(f"\n{'='*60}")
@@ -883,16 +4332,17 @@ class BlessingScraper:
         print(header)
         print("-" * len(header))
 
+        bucket_counts = self.store.counts()
         for rel in RELATIONSHIPS:
             for style in STYLES:
                 counts = []
                 for length in LENGTHS:
-                    c = len(self.blessings[rel][style][length])
+                    c = bucket_counts.get((rel, style, length), 0)
                     total += c
-                    if c >= TARGET_PER_BUCKET:
+                    if c >= self.target:
                         full += 1
                     else:
-                        gaps.append(f"{REL_LABELS[rel]}x{STYLE_LABELS[style]}x{length} ({c}/{TARGET_PER_BUCKET})")
+                        gaps.append(f"{REL_LABELS[rel]}x{STYLE_LABELS[style]}x{length} ({c}/{self.target})")
                     counts.append(c)
                 print(f"{REL_LABELS[rel]:>10} {STYLE_LABELS[style]:>8} {counts[0]:>6} {counts[1]:>7} {counts[2]:>6}")
 
@@ -931,7 +4381,7 @@ class BlessingScraper:
                 print()
 
         print(f"Total: {len(all_seeds)} seed URLs + {total_queries} search queries")
-        print(f"Target: 90 buckets x {TARGET_PER_BUCKET} = {90 * TARGET_PER_BUCKET} blessings")
+        print(f"Target: 90 buckets x {self.target} = {90 * self.target} blessings")
 
 
 # ---------------------------------------------------------------------------
@@ -939,25 +4389,162 @@ class BlessingScraper:
 # ---------------------------------------------------------------------------
 
 
+def write_profile(profiler: cProfile.Profile, path: Path = PROFILE_FILE, top: int = 30):
+    """Save cProfile stats for snakeviz/pstats and print the top functions by cumulative time."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(path)
+    print(f"\nProfile written to {path} (python -m pstats {path})")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+
+
 def main():
     parser = argparse.ArgumentParser(description="新年祝福语爬虫脚本")
     parser.add_argument("--resume", action="store_true", help="断点续爬，跳过已完成组合")
     parser.add_argument("--stats", action="store_true", help="查看已有数据覆盖率")
+    parser.add_argument("--compact", action="store_true",
+                        help="不爬取：回放追加日志，重新生成 blessings.json")
     parser.add_argument("--dry-run", action="store_true", help="只显示搜索词不实际爬取")
+    parser.add_argument("--export", action="store_true",
+                        help="不爬取：把语料导出为 manifest.json + 按分类分片、带内容哈希的紧凑 JSON(含 .gz/.br)，供前端按需加载")
+    parser.add_argument("--export-from", type=Path, default=None,
+                        help="--export 的数据来源 blessings.json (默认为当前语料存储)")
+    parser.add_argument("--export-dir", type=Path, default=EXPORT_DIR,
+                        help=f"--export 的输出目录 (默认 {EXPORT_DIR.relative_to(SCRIPT_DIR.parent)})")
+    parser.add_argument("--export-shard", choices=["bucket", "relationship"], default="bucket",
+                        help="分片粒度 (默认 bucket: 每个关系×风格×长度一个文件；relationship: 每个关系一个文件)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并发抓取线程数(同一域名仍按原延迟限速，默认 1 即顺序抓取)")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="不联网：用已归档的原始页面重新提取、过滤、分类并生成输出")
+    parser.add_argument("--serp-ttl", type=float, default=SERP_CACHE_TTL / 3600,
+                        help=f"搜索结果缓存有效期(小时)，期内重跑不再请求搜索引擎 (默认 {SERP_CACHE_TTL // 3600})")
+    parser.add_argument("--no-serp-cache", action="store_true", help="不使用搜索结果缓存")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"用 cProfile 运行并打印热点函数(结果另存为 {PROFILE_FILE.name})")
+    parser.add_argument("--cpu-workers", type=int, default=0,
+                        help="页面解析/提取/分类使用的进程数(默认 0 即在主线程内完成)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="--reprocess 使用的进程数(默认 CPU 核数)")
+    parser.add_argument("--extractor", choices=list(EXTRACTORS), default=DEFAULT_EXTRACTOR,
+                        help=f"候选文本提取后端 (默认 {DEFAULT_EXTRACTOR}: 单遍流式 lxml；bs4: 原 BeautifulSoup 实现)")
+    parser.add_argument("--no-archive", action="store_true", help="不归档抓取到的原始页面")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地 HTTP 响应缓存")
+    parser.add_argument("--no-frontier", action="store_true",
+                        help="忽略跨运行的 URL 抓取记录(不跳过失败/无内容页面，不按产出排序)")
+    parser.add_argument("--cached-only", action="store_true",
+                        help="离线模式：只使用本地缓存的页面，不发出任何网络请求")
+    parser.add_argument("--cache-ttl", type=float, default=HTTP_CACHE_TTL / 3600,
+                        help="缓存有效期(小时)，过期后发条件请求重新验证")
+    parser.add_argument("--cache-max-mb", type=int, default=HTTP_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="缓存体积上限(MB)，超出后按最近最少使用淘汰")
+    parser.add_argument("--dedup-threshold", type=float, default=GLOBAL_SIMILARITY_THRESHOLD,
+                        help=f"跨分类近似去重阈值 (默认 {GLOBAL_SIMILARITY_THRESHOLD})")
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json",
+                        help="语料存储 (默认 json: 内存 + 追加日志；sqlite: 带索引的 SQLite 库，适合大目标量)")
+    parser.add_argument("--db", type=Path, default=CORPUS_DB_FILE,
+                        help="--store sqlite 使用的数据库文件")
+    parser.add_argument("--shared-pool", action="store_true",
+                        help="共享候选池：每个页面的候选只分类一次，分配到所有未满的分类桶")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="自适应调度：按产出记录优先搜索最缺的分类和最有效的搜索词，低产出时停止翻页")
+    parser.add_argument("--max-requests", type=int, default=None,
+                        help="--adaptive 第二阶段的请求预算(搜索页 + 文章页)")
+    parser.add_argument("--search-base", default=None,
+                        help="搜索引擎地址(如本地 scripts/sogou_stub_server.py 的 http://127.0.0.1:8765)")
+    parser.add_argument("--target", type=int, default=TARGET_PER_BUCKET,
+                        help=f"每个分类桶的目标条数 (默认 {TARGET_PER_BUCKET})")
+    parser.add_argument("--max-page-kb", type=int, default=PAGE_MAX_BYTES // 1024,
+                        help=f"单个页面最多下载的字节数(KB)，超出部分截断 (默认 {PAGE_MAX_BYTES // 1024})")
+    parser.add_argument("--retries", type=int, default=HTTP_RETRIES,
+                        help=f"连接错误/5xx 时 GET 的重试次数 (默认 {HTTP_RETRIES}，0 表示不重试)")
+    parser.add_argument("--retry-backoff", type=float, default=HTTP_RETRY_BACKOFF,
+                        help=f"重试指数退避基数(秒) (默认 {HTTP_RETRY_BACKOFF})")
     args = parser.parse_args()
 
+    if args.search_base:
+        use_search_base(args.search_base)
+
     if args.dry_run:
-        scraper = BlessingScraper(resume=False)
+        scraper = BlessingScraper(resume=False, target=args.target)
         scraper.dry_run()
         return
 
-    if args.stats:
-        scraper = BlessingScraper(resume=True)
-        scraper.print_stats()
+    if args.store == "sqlite":
+        store = SqliteCorpus(args.db)
+    else:
+        store = MemoryCorpus(dedup_threshold=args.dedup_threshold)
+
+    if args.export and args.export_from:
+        with open(args.export_from, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        export_shards(iter_buckets(data["blessings"]), args.export_dir, args.export_shard,
+                      data.get("metadata"))
+        return
+
+    if args.stats or args.compact or args.export:
+        scraper = BlessingScraper(resume=True, store=store, target=args.target)
+        try:
+            if args.stats:
+                scraper.print_stats()
+            elif args.export:
+                scraper.export(args.export_dir, args.export_shard)
+            else:
+                scraper._save_output()
+        finally:
+            scraper.close()
+        return
+
+    if args.reprocess:
+        scraper = BlessingScraper(resume=False, dedup_threshold=args.dedup_threshold,
+                                  extractor=args.extractor, store=store, target=args.target,
+                                  shared_pool=args.shared_pool)
+        try:
+            scraper.reprocess(processes=args.processes)
+        finally:
+            scraper.close()
         return
 
-    scraper = BlessingScraper(resume=args.resume)
-    scraper.scrape_all()
+    cache = None
+    if not args.no_cache or args.cached_only:
+        cache = ResponseCache(ttl=args.cache_ttl * 3600,
+                              max_bytes=args.cache_max_mb * 1024 * 1024,
+                              offline=args.cached_only)
+
+    archive = None if args.no_archive else PageArchive()
+
+    scraper = BlessingScraper(resume=args.resume, workers=args.workers,
+                              dedup_threshold=args.dedup_threshold, cache=cache,
+                              archive=archive, extractor=args.extractor,
+                              store=store, target=args.target,
+                              frontier=None if args.no_frontier else UrlFrontier(),
+                              shared_pool=args.shared_pool,
+                              scheduler=QueryScheduler(SearchStats(), args.target) if args.adaptive else None,
+                              max_requests=args.max_requests,
+                              governor=RateGovernor(),
+                              session=create_session(pool_size=args.workers + 1,
+                                                     retries=args.retries,
+                                                     backoff=args.retry_backoff),
+                              max_page_bytes=args.max_page_kb * 1024,
+                              cpu_workers=args.cpu_workers,
+                              serp_cache=None if args.no_serp_cache else SerpCache(ttl=args.serp_ttl * 3600),
+                              redirects=RedirectCache())
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        scraper.scrape_all()
+    except KeyboardInterrupt:
+        print("\nInterrupted, compacting store before exit...")
+        scraper._save_output()
+        scraper.write_metrics()
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler)
+        scraper.close()
+        if archive is not None:
+            archive.close()
 
 
 if __name__ == "__main__":
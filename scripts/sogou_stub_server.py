@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+搜狗搜索本地模拟服务器
+
+离线测试爬虫的搜索、跳转解析、限速与熔断逻辑：模拟搜狗微信搜索(/weixin)、
+搜狗网页搜索(/web)、/link 跳转页和文章页(/s?__biz=...)，文章内容取自 blessings.json。
+每个搜索引擎按滑动窗口限流，超出后在封禁期内返回"访问过于频繁"反爬页面。
+与真实搜狗一样，/link 的 url 参数每次搜索都不同，文章链接带 chksm/scene 等跟踪参数；
+--articles 让不同搜索词命中同一批文章，用于测试跳转缓存与按文章去重。
+
+Usage:
+    python scripts/sogou_stub_server.py                          # 监听 127.0.0.1:8765
+    python scripts/sogou_stub_server.py --limit 5 --window 60    # 每分钟 5 次搜索后触发反爬
+    python scripts/sogou_stub_server.py --articles 300           # 所有搜索结果取自 300 篇文章
+    python scripts/scrape_blessings.py --search-base http://127.0.0.1:8765 --adaptive
+
+    curl http://127.0.0.1:8765/stats                             # 各路径请求数与封禁次数
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_BLESSINGS_FILE = SCRIPT_DIR.parent / "blessings.json"
+
+RESULTS_PER_PAGE = 10
+BLESSINGS_PER_ARTICLE = 12
+
+BLOCKED_PAGE = (
+    "<html><head><title>antispider</title></head><body>"
+    "<p>用户您好，您的访问过于频繁，为确认本次访问为正常用户行为，需要您协助验证。</p>"
+    "</body></html>"
+)
+
+
+def load_texts(path: Path) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [item["text"]
+            for styles in data["blessings"].values()
+            for lengths in styles.values()
+            for items in lengths.values()
+            for item in items]
+
+
+class Throttle:
+    """Sliding-window limit per engine; exceeding it blocks the engine for a while."""
+
+    def __init__(self, limit: int, window: float, block: float):
+        self.limit = limit
+        self.window = window
+        self.block = block
+        self._lock = threading.Lock()
+        self._recent: dict[str, deque] = {}
+        self._blocked_until: dict[str, float] = {}
+        self.blocks = Counter()
+
+    def allow(self, engine: str) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until.get(engine, 0):
+                return False
+            recent = self._recent.setdefault(engine, deque())
+            while recent and now - recent[0] > self.window:
+                recent.popleft()
+            if self.limit and len(recent) >= self.limit:
+                self._blocked_until[engine] = now + self.block
+                self.blocks[engine] += 1
+                recent.clear()
+                return False
+            recent.append(now)
+            return True
+
+
+def article_id(query: str, page: int, rank: int, articles: int = 0) -> str:
+    """Article behind one result; with articles > 0 results repeat across queries."""
+    key = f"{query}|{page}|{rank}"
+    if articles:
+        key = str(int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % articles)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def article_path(token: str) -> str:
+    """WeChat-style article URL for a token, with per-visit tracking parameters."""
+    return (f"/s?__biz=MzA{token[:8]}==&mid={int(token[8:], 16) % 10**10}&idx=1&sn={token}"
+            f"&chksm={random.getrandbits(64):016x}&scene=27#wechat_redirect")
+
+
+def make_handler(texts: list[str], throttle: Throttle, requests_seen: Counter, articles: int = 0):
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, body: str, status: int = 200):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _base(self) -> str:
+            return f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            requests_seen["/s" if parts.path.startswith("/s/") else parts.path] += 1
+
+            if parts.path == "/stats":
+                self._send(json.dumps({"requests": requests_seen, "blocks": throttle.blocks}))
+            elif parts.path in ("/weixin", "/web"):
+                engine = "weixin" if parts.path == "/weixin" else "sogou"
+                if not throttle.allow(engine):
+                    self._send(BLOCKED_PAGE)
+                    return
+                self._send(self._results(engine, params.get("query", ""), int(params.get("page", 1))))
+            elif parts.path == "/link":
+                self._send(self._redirect(params.get("url", "")))
+            elif parts.path == "/s":
+                self._send(self._article(params.get("sn", "")))
+            elif parts.path.startswith("/s/"):
+                self._send(self._article(parts.path[3:]))
+            else:
+                self._send("<html><body>not found</body></html>", status=404)
+
+        def _results(self, engine: str, query: str, page: int) -> str:
+            ids = [article_id(query, page, rank, articles) for rank in range(RESULTS_PER_PAGE)]
+            if engine == "weixin":
+                # The url token differs on every search, like Sogou's per-session links
+                items = "".join(f'<div class="txt-box"><h3><a href="/link?url={i}{random.getrandbits(32):08x}'
+                                f'&amp;type=2">{query} {i}</a></h3></div>'
+                                for i in ids)
+            else:
+                items = "".join(f'<div class="vrwrap"><a href="{self._base()}{article_path(i)}">{query} {i}</a></div>'
+                                for i in ids)
+            return f"<html><body>{items}</body></html>"
+
+        def _redirect(self, token: str) -> str:
+            target = f"{self._base()}{article_path(token[:16])}"
+            fragments = "".join(f"url += '{target[i:i + 8]}';" for i in range(0, len(target), 8))
+            return f"<html><head><script>var url = '';{fragments}window.location.replace(url);</script></head></html>"
+
+        def _article(self, token: str) -> str:
+            rng = random.Random(token)
+            picks = rng.sample(texts, min(BLESSINGS_PER_ARTICLE, len(texts)))
+            body = "".join(f"<p>{n}、{text}</p>" for n, text in enumerate(picks, 1))
+            return (f"<html><head><meta charset='utf-8'><title>{token}</title></head><body>"
+                    f"<div id='js_content' class='rich_media_content'>{body}</div></body></html>")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜狗搜索本地模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--blessings", type=Path, default=DEFAULT_BLESSINGS_FILE,
+                        help="文章内容来源 blessings.json")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="每个搜索引擎在窗口内允许的请求数 (0 表示不限)")
+    parser.add_argument("--window", type=float, default=60, help="限流窗口(秒)")
+    parser.add_argument("--block", type=float, default=30, help="触发反爬后的封禁时长(秒)")
+    parser.add_argument("--articles", type=int, default=0,
+                        help="搜索结果取自的文章总数 (0 表示每个结果都是不同文章)")
+    args = parser.parse_args()
+
+    throttle = Throttle(args.limit, args.window, args.block)
+    handler = make_handler(load_texts(args.blessings), throttle, Counter(), args.articles)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Sogou stub listening on http://{args.host}:{args.port} "
+          f"(limit {args.limit}/{args.window:.0f}s, block {args.block:.0f}s"
+          + (f", {args.articles} articles)" if args.articles else ")"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()